@@ -0,0 +1,77 @@
+"""
+cache.py - On-disk TTL cache for downloaded data (survives process restarts)
+
+Purpose:
+    Re-runs of the fetch pipeline within the TTL window skip Yahoo entirely.
+    - One file per key: {root}/{namespace}/{md5(key)}.pkl.zst
+    - pickle protocol 5 + zstd level 1 (DataFrames load in a few ms)
+    - Expiry by file mtime; corrupt/unreadable entries count as misses
+    - Atomic writes (tmp file + rename) → safe with thread pools
+
+Usage:
+    cache = FileCache(".cache/yfinance", ttl=timedelta(days=1))
+
+    @cache.memoize(key=lambda t, interval: f"{t}|{interval}", namespace=lambda t, interval: t)
+    def download(t, interval): ...
+
+Last modified: January 2026
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+from pathlib import Path
+
+import zstandard as zstd
+
+
+class FileCache:
+    """Pickled objects on disk, zstd-compressed, expiring after ttl."""
+
+    def __init__(self, root: str | Path = ".cache", ttl: timedelta = timedelta(days=1), level: int = 1):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.level = level
+
+    def _path(self, namespace: str, key: str) -> Path:
+        return self.root / namespace / f"{hashlib.md5(key.encode()).hexdigest()}.pkl.zst"
+
+    def get(self, namespace: str, key: str, ttl: timedelta | None = None):
+        """Cached value, or None when missing / expired / unreadable."""
+        path = self._path(namespace, key)
+        try:
+            if time.time() - path.stat().st_mtime > (ttl or self.ttl).total_seconds():
+                return None
+            return pickle.loads(zstd.ZstdDecompressor().decompress(path.read_bytes()))
+        except (OSError, EOFError, pickle.UnpicklingError, zstd.ZstdError):
+            return None
+
+    def set(self, namespace: str, key: str, value) -> None:
+        path = self._path(namespace, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        blob = zstd.ZstdCompressor(level=self.level).compress(pickle.dumps(value, protocol=5))
+        tmp = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(blob)
+        tmp.replace(path)
+
+    def memoize(self, key, namespace=lambda *args, **kwargs: "default", ttl: timedelta | None = None):
+        """
+        Decorator: key(*args, **kwargs) / namespace(*args, **kwargs) build the cache entry.
+        None results are not cached, so failures are retried on the next call.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                ns, k = namespace(*args, **kwargs), key(*args, **kwargs)
+                hit = self.get(ns, k, ttl)
+                if hit is not None:
+                    return hit
+                value = func(*args, **kwargs)
+                if value is not None:
+                    self.set(ns, k, value)
+                return value
+            return wrapper
+        return decorator
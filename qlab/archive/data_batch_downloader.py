@@ -6,6 +6,8 @@ Purpose:
     Supports range input: e.g., process batch_003.txt to batch_015.txt in one run.
     Automatically switches lookback period for intraday intervals (1m, 2m, 5m, etc.)
     to avoid Yahoo's 7-8 day limit.
+    yf.download() calls run one at a time (yfinance keeps per-call results in module
+    globals); a small thread pool saves each finished sub-batch while the next one downloads.
 
 New Usage Examples:
     python data_batch_downloader.py               # uses hardcoded START/END
@@ -15,18 +17,23 @@ New Usage Examples:
 
 Configuration:
     Edit globals or use command-line args for flexibility.
+    run_batches(start, end, interval) is the in-process entry point (used by 01_data_ingestion_pipeline).
     Sub-batches of 100 tickers per yf.download() call for reliability.
+    MAX_WORKERS sub-batches in flight: one downloading (≤ 1 call / 2 s), the others saving parquet.
 
 Last modified: January 2026
 """
 
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 import random
 import sys
+import threading
 import pandas as pd
 from tqdm import tqdm
 import yfinance as yf
+from ratelimit import limits, sleep_and_retry
 
 # Optional: better rate-limit resistance (pip install curl_cffi)
 # from curl_cffi import requests 
@@ -36,21 +43,35 @@ import yfinance as yf
 # ── GLOBAL CONFIGURATION ─────────────────────────────────────────────────────
 INTERVAL = "1d"                         # "1d", "1wk", "1m", "5m", etc.
 
-# Automatic lookback logic based on interval
-if INTERVAL in ["1m", "2m", "5m", "15m", "30m", "60m", "90m"]:
-    LOOKBACK_MODE = "recent"
-    LOOKBACK_PERIOD = "7d"              # safe default: "7d", "30d", "60d"
-    print(f"Using {LOOKBACK_MODE} mode for {INTERVAL} interval → period={LOOKBACK_PERIOD}")
-else:
-    LOOKBACK_MODE = "full"
-    LOOKBACK_PERIOD = "2010-01-01"      # or "max", "10y", etc.
-    print(f"Using {LOOKBACK_MODE} mode for {INTERVAL} interval → start={LOOKBACK_PERIOD}")
+INTRADAY_INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m"]
+RECENT_PERIOD = "7d"                    # intraday lookback — safe default: "7d", "30d", "60d"
+FULL_START = "2010-01-01"               # daily+ start — or "max", "10y", etc.
 
-BASE_DIR = Path("data/yfinance/batches")
-SAVE_DIRECTORY = Path("./data/yfinance") / INTERVAL
-SAVE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+DATA_ROOT = Path("data/yfinance")       # shared root: standardize / processing_EV / quality scan read here
+BASE_DIR = DATA_ROOT / "batches"
+SAVE_DIRECTORY = DATA_ROOT / INTERVAL
 
 SUB_BATCH_SIZE = 100                    # Tickers per yf.download() call — safe value
+# Sub-batches in flight. yf.download() runs one at a time (DOWNLOAD_LOCK) and at most RATE_CALLS per
+# RATE_PERIOD, so extra workers never speed up downloads — they only overlap parquet saves with the next one
+MAX_WORKERS    = 4
+
+# zstd(3) + dictionary: ~30% smaller than snappy for OHLCV; stats enable filter pushdown
+PARQUET_WRITE_OPTIONS = dict(
+    compression="zstd",
+    compression_level=3,
+    use_dictionary=True,
+    row_group_size=131_072,
+    data_page_size=1 << 20,
+    write_statistics=True,
+)
+
+# Shared token bucket: at most RATE_CALLS yf.download() calls per RATE_PERIOD seconds
+RATE_CALLS  = 1
+RATE_PERIOD = 2
+
+# yf.download() collects results in module-global dicts (shared._DFS/_ERRORS) → never overlap two calls
+DOWNLOAD_LOCK = threading.Lock()
 
 # Default range if no command-line args provided
 DEFAULT_BATCH_START = 1
@@ -93,17 +114,84 @@ def load_tickers(path: Path) -> list[str]:
     return tickers
 
 
-def save_ticker_data(ticker: str, df: pd.DataFrame):
+def lookback_for(interval: str) -> tuple[str, dict]:
+    """Automatic lookback logic based on interval → (mode, yf.download kwargs)."""
+    if interval in INTRADAY_INTERVALS:
+        print(f"Using recent mode for {interval} interval → period={RECENT_PERIOD}")
+        return "recent", {"period": RECENT_PERIOD}
+    print(f"Using full mode for {interval} interval → start={FULL_START}")
+    return "full", {"start": FULL_START}
+
+
+def save_ticker_data(ticker: str, df: pd.DataFrame, save_dir: Path = SAVE_DIRECTORY):
     """Simple per-ticker Parquet save."""
     if df.empty:
         return False
-    file_path = SAVE_DIRECTORY / f"{ticker}.parquet"
-    df.to_parquet(file_path, compression="snappy", index=True)
+    file_path = save_dir / f"{ticker}.parquet"
+    # float32 prices / int64 volume halve the bytes every reader has to scan
+    casts = {c: "float32" for c in ["Open", "High", "Low", "Close"] if c in df.columns}
+    if "Volume" in df.columns and not df["Volume"].isna().any():
+        casts["Volume"] = "int64"
+    df.astype(casts).rename_axis("ts").to_parquet(file_path, index=True, **PARQUET_WRITE_OPTIONS)
     return True
 
 
-def process_single_batch(batch_num: int):
-    batch_file = BASE_DIR / f"batch_{batch_num:03d}.txt"
+@sleep_and_retry
+@limits(calls=RATE_CALLS, period=RATE_PERIOD)
+def rate_limited_download(**kwargs) -> pd.DataFrame:
+    """yf.download() behind the module-wide limiter, one call at a time across all worker threads."""
+    with DOWNLOAD_LOCK:
+        return yf.download(**kwargs)
+
+
+def process_sub_batch(sub_num: int, sub_batch: list[str], fetch_kwargs: dict,
+                      interval: str = INTERVAL, save_dir: Path = SAVE_DIRECTORY):
+    """Download one sub-batch and save each ticker. Returns (success, failed)."""
+    success = 0
+    failed = 0
+
+    try:
+        data = rate_limited_download(
+            tickers=" ".join(sub_batch),
+            interval=interval,
+            **fetch_kwargs,
+            group_by="ticker",
+            threads=True,
+            progress=False,
+            auto_adjust=True,
+            actions=False,
+            ignore_tz=interval not in INTRADAY_INTERVALS,   # keep exchange tz on intraday bars
+            timeout=20,
+            # session=session,  # uncomment if using curl_cffi
+        )
+
+        for ticker in sub_batch:
+            try:
+                if ticker in data.columns.levels[0]:
+                    df = data[ticker].dropna(how="all")
+                    if not df.empty:
+                        if save_ticker_data(ticker, df, save_dir):
+                            success += 1
+                        else:
+                            failed += 1
+                    else:
+                        failed += 1
+                else:
+                    failed += 1
+            except Exception as e:
+                print(f"  {ticker:<10} save error: {str(e)}")
+                failed += 1
+
+    except Exception as e:
+        print(f"Sub-batch {sub_num} failed ({len(sub_batch)} tickers): {str(e)}")
+        failed += len(sub_batch)
+
+    return success, failed
+
+
+def process_single_batch(batch_num: int, interval: str = INTERVAL, batch_dir: Path = BASE_DIR,
+                         save_dir: Path = SAVE_DIRECTORY, fetch_kwargs: dict | None = None):
+    batch_file = batch_dir / f"batch_{batch_num:03d}.txt"
     print(f"\n{'='*30} Processing batch {batch_num:03d} {'='*30}")
     print(f"File: {batch_file}")
 
@@ -115,72 +203,42 @@ def process_single_batch(batch_num: int):
     skip = {"AACB", "AACBU", "AAM", "ZIP", "ZOOZW"}
     tickers = [t for t in tickers if t not in skip]
 
-    # Set fetch parameters based on mode
-    if LOOKBACK_MODE == "recent":
-        fetch_kwargs = {"period": LOOKBACK_PERIOD}
-    else:
-        fetch_kwargs = {"start": LOOKBACK_PERIOD}
+    if fetch_kwargs is None:
+        _, fetch_kwargs = lookback_for(interval)
+
+    sub_batches = [tickers[i:i + SUB_BATCH_SIZE] for i in range(0, len(tickers), SUB_BATCH_SIZE)]
 
     success = 0
     failed = 0
 
-    for i in tqdm(range(0, len(tickers), SUB_BATCH_SIZE), desc=f"Batch {batch_num:03d} sub-batches", unit="sub"):
-        sub_batch = tickers[i:i + SUB_BATCH_SIZE]
-
-        try:
-            data = yf.download(
-                tickers=" ".join(sub_batch),
-                interval=INTERVAL,
-                **fetch_kwargs,
-                group_by="ticker",
-                threads=True,
-                progress=False,
-                auto_adjust=True,
-                actions=False,
-                ignore_tz=True,
-                timeout=20,
-                # session=session,  # uncomment if using curl_cffi
-            )
-
-            for ticker in sub_batch:
-                try:
-                    if ticker in data.columns.levels[0]:
-                        df = data[ticker].dropna(how="all")
-                        if not df.empty:
-                            if save_ticker_data(ticker, df):
-                                success += 1
-                            else:
-                                failed += 1
-                        else:
-                            failed += 1
-                    else:
-                        failed += 1
-                except Exception as e:
-                    print(f"  {ticker:<10} save error: {str(e)}")
-                    failed += 1
-
-        except Exception as e:
-            print(f"Sub-batch {i//SUB_BATCH_SIZE + 1} failed ({len(sub_batch)} tickers): {str(e)}")
-            failed += len(sub_batch)
-
-        time.sleep(1.5 + random.uniform(0, 2.5))  # polite delay
+    # Downloads take turns on DOWNLOAD_LOCK; each thread then saves its sub-batch (Arrow IO releases the GIL)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        futures = [ex.submit(process_sub_batch, n, sub, fetch_kwargs, interval, save_dir)
+                   for n, sub in enumerate(sub_batches, start=1)]
+        for fut in tqdm(as_completed(futures), total=len(futures),
+                        desc=f"Batch {batch_num:03d} sub-batches", unit="sub"):
+            succ, fail = fut.result()
+            success += succ
+            failed += fail
 
     print(f"Batch {batch_num:03d} done → Success: {success} | Failed/empty: {failed}")
     return success, failed
 
 
-def main():
-    SAVE_DIRECTORY.mkdir(parents=True, exist_ok=True)
-    print(f"Save location: {SAVE_DIRECTORY.resolve()}\n")
+def run_batches(start_batch: int, end_batch: int, interval: str = INTERVAL, batch_dir: Path = BASE_DIR):
+    """Download batch_<start>..batch_<end> from batch_dir into DATA_ROOT/<interval>/TICKER.parquet."""
+    save_dir = DATA_ROOT / interval
+    save_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Save location: {save_dir.resolve()}\n")
+    _, fetch_kwargs = lookback_for(interval)
 
-    start_batch, end_batch = get_batch_range()
     print(f"Processing batches from {start_batch:03d} to {end_batch:03d}\n")
 
     total_success = 0
     total_failed = 0
 
     for batch_num in range(start_batch, end_batch + 1):
-        succ, fail = process_single_batch(batch_num)
+        succ, fail = process_single_batch(batch_num, interval, Path(batch_dir), save_dir, fetch_kwargs)
         total_success += succ
         total_failed += fail
 
@@ -193,6 +251,11 @@ def main():
     print(f"Total successfully saved : {total_success}")
     print(f"Total failed / empty     : {total_failed}")
     print("="*80)
+    return total_success, total_failed
+
+
+def main():
+    run_batches(*get_batch_range())
 
 
 if __name__ == "__main__":
@@ -48,12 +48,16 @@ Last modified: January 2026
 """
 
 import yfinance as yf
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 from abc import ABC, abstractmethod
 from ratelimit import limits, sleep_and_retry
 
+# Largest normal spacing between consecutive bars (long weekends / holiday weeks); more = a gap
+MAX_BAR_SPACING = {"1d": np.timedelta64(5, "D"), "1wk": np.timedelta64(14, "D")}
+
 
 class DataSource(ABC):
     @abstractmethod
@@ -110,6 +114,7 @@ class DataFetcher:
         self.last_fetch_week = None
         self.save_root = Path(save_dir)
         self.save_root.mkdir(parents=True, exist_ok=True)
+        self._dirs: dict = {}                   # created sub-folders (no mkdir syscall per ticker)
 
     def _get_current_week(self):
         return datetime.now().isocalendar()[:2]
@@ -147,6 +152,7 @@ class DataFetcher:
 
         # ── Incremental fetch for non-1m (or if period not forced) ──────────────
         existing_last_date = None
+        old_df = None                     # handed to _append_and_save → the file is decoded once
         path = self._get_file_path(ticker, interval)
 
         if save and path.exists() and interval != "1m":  # skip incremental for 1m auto mode
@@ -177,26 +183,61 @@ class DataFetcher:
         self.last_fetch_week = self._get_current_week()
 
         if save:
-            self._append_and_save(ticker, data, interval, existing_last_date)
+            self._append_and_save(ticker, data, interval, existing_last_date, old_df=old_df)
 
         return data
 
+    def _interval_dir(self, interval: str) -> Path:
+        """save_root/<interval>, created on first use only (no mkdir syscall per ticker)."""
+        folder = self._dirs.get(interval)
+        if folder is None:
+            folder = self.save_root / interval.replace(" ", "").lower()
+            folder.mkdir(parents=True, exist_ok=True)
+            self._dirs[interval] = folder
+        return folder
+
     def _get_file_path(self, ticker: str, interval: str) -> Path:
-        interval_clean = interval.replace(" ", "").lower()
-        folder = self.save_root / interval_clean
-        folder.mkdir(parents=True, exist_ok=True)
-        return folder / f"{ticker.upper()}.parquet"
+        return self._interval_dir(interval) / f"{ticker.upper()}.parquet"
+
+    @staticmethod
+    def _strictly_after(old_df: pd.DataFrame, new_df: pd.DataFrame) -> bool:
+        """True if both frames are sorted and unique and new_df starts after old_df ends."""
+        old_idx, new_idx = old_df.index, new_df.index
+        return (
+            len(new_idx) > 0
+            and old_idx.is_monotonic_increasing and not old_idx.has_duplicates   # unique comes free with the monotonic check
+            and new_idx.is_monotonic_increasing and not new_idx.has_duplicates
+            and new_idx[0] > old_idx[-1]
+        )
 
-    def _append_and_save(self, ticker: str, new_df: pd.DataFrame, interval: str, existing_last_date=None):
+    @staticmethod
+    def _max_volume_rows(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        One row per timestamp of a sorted frame: the highest Volume (first one on ties; NaN never wins
+        unless the whole timestamp is NaN). Works on runs of equal timestamps – no groupby hash table.
+        """
+        ts = df.index.values
+        starts = np.flatnonzero(np.r_[True, ts[1:] != ts[:-1]])
+        vol = df['Volume'].to_numpy(dtype=float, na_value=np.nan)
+        vol = np.where(np.isnan(vol), -np.inf, vol)
+        run_max = np.repeat(np.maximum.reduceat(vol, starts), np.diff(np.r_[starts, len(vol)]))
+        cand = np.flatnonzero(vol == run_max)
+        run = np.searchsorted(starts, cand, side='right') - 1
+        return df.iloc[cand[np.r_[True, run[1:] != run[:-1]]]]
+
+    def _append_and_save(self, ticker: str, new_df: pd.DataFrame, interval: str, existing_last_date=None,
+                         old_df: pd.DataFrame | None = None):
+        """old_df: the stored frame if the caller already read it (None → read it here)."""
         path = self._get_file_path(ticker, interval)
 
-        old_df = pd.DataFrame()
-        if path.exists():
-            try:
-                old_df = pd.read_parquet(path)
-                print(f"Loaded existing: {len(old_df)} rows (last: {old_df.index.max().date()})")
-            except Exception as e:
-                print(f"Failed to read {path}: {e} → treating as new")
+        if old_df is None:
+            old_df = pd.DataFrame()
+            if path.exists():
+                try:
+                    old_df = pd.read_parquet(path)
+                    print(f"Loaded existing: {len(old_df)} rows (last: {old_df.index.max().date()})")
+                except Exception as e:
+                    print(f"Failed to read {path}: {e} → treating as new")
 
         if old_df.empty:
             print(f"Creating new file for {ticker} ({interval})")
@@ -208,17 +249,22 @@ class DataFetcher:
         print(f"Appending {len(new_df)} new rows")
 
         combined = pd.concat([old_df, new_df])
-        combined = combined.sort_index()
-
-        # Remove exact duplicates
         before = len(combined)
-        combined = combined.drop_duplicates(keep='last')
-        exact_dupes = before - len(combined)
+        exact_dupes = 0
+
+        # Typical update: all new bars after history → already sorted + unique, skip the cleanup passes
+        if not self._strictly_after(old_df, new_df):
+            if not combined.index.is_monotonic_increasing:
+                combined = combined.sort_index(kind='stable')   # ties below keep stored-before-new order
+
+            # Remove exact duplicates
+            combined = combined.drop_duplicates(keep='last')
+            exact_dupes = before - len(combined)
 
-        # Resolve timestamp conflicts (keep highest volume row)
-        if combined.index.duplicated().any():
-            print(f"Resolving timestamp conflicts for {ticker} (highest volume)")
-            combined = combined.loc[combined.groupby(combined.index)['Volume'].idxmax()]
+            # Resolve timestamp conflicts (keep highest volume row)
+            if combined.index.has_duplicates:          # cached on the index – no bool array built
+                print(f"Resolving timestamp conflicts for {ticker} (highest volume)")
+                combined = self._max_volume_rows(combined)
 
         after = len(combined)
 
@@ -227,13 +273,13 @@ class DataFetcher:
         if after < before - exact_dupes:
             print(f"Resolved {before - exact_dupes - after} timestamp conflicts")
 
-        # Continuity warning for daily/weekly
-        if interval in ["1d", "1wk"] and len(combined) > 20:
-            span_days = (combined.index.max() - combined.index.min()).days
-            rough_expected = span_days / (7 if interval == "1wk" else 1) * 0.7
-            if len(combined) < rough_expected * 0.6:
-                print(f"Warning: possible gaps in {ticker} ({interval}) "
-                      f"({len(combined)} bars over ~{span_days} days)")
+        # Continuity warning for daily/weekly: count bar-to-bar steps wider than a holiday weekend
+        max_spacing = MAX_BAR_SPACING.get(interval)
+        if max_spacing is not None and len(combined) > 20:
+            gaps = int((np.diff(combined.index.values) > max_spacing).sum())   # index is sorted here
+            if gaps:
+                print(f"Warning: {gaps} gaps > {max_spacing.astype(int)} days in {ticker} ({interval}) "
+                      f"({len(combined)} bars)")
 
         combined.to_parquet(path, index=True)
         print(f"Updated: {path} (now {len(combined)} rows)")
@@ -41,7 +41,8 @@ def setup_qlab_duckdb(db_path: Path = DB_PATH, read_only=False):
     # Register views for EVERY interval
     for interval in INTERVALS:
         parquet_folder = BASE_DATA_DIR / interval
-        if not parquet_folder.exists() or not any(parquet_folder.glob("*.parquet")):
+        # Flat <TICKER>.parquet files and DataFetcher's <TICKER>.parquet/year=YYYY/part-*.parquet datasets
+        if not parquet_folder.exists() or not any(p.is_file() for p in parquet_folder.rglob("*.parquet")):
             print(f"Skipping {interval} — no Parquet files found")
             continue
         
@@ -52,8 +53,8 @@ def setup_qlab_duckdb(db_path: Path = DB_PATH, read_only=False):
         CREATE OR REPLACE VIEW {view_name} AS
         SELECT
             '{interval}'                                      AS interval,
-            regexp_replace(filename, '.parquet$', '')         AS symbol,   -- or use clean_symbol(filename)
-            "Datetime"                                            AS ts,       -- your datetime index
+            regexp_extract(filename, '([^/\\\\]+)\\.parquet(?:[/\\\\]|$)', 1) AS symbol,   -- first <TICKER>.parquet path component
+            "ts"                                              AS ts,       -- timestamp index (see data_standardize_parquets)
             "Open"::DOUBLE                                    AS open,
             High::DOUBLE                                      AS high,
             Low::DOUBLE                                       AS low,
@@ -61,8 +62,10 @@ def setup_qlab_duckdb(db_path: Path = DB_PATH, read_only=False):
             Volume::BIGINT                                    AS volume,
             filename                                          AS source_file
         FROM read_parquet(
-            '{parquet_folder}/*.parquet',
-            filename = true
+            '{parquet_folder}/**/*.parquet',
+            filename = true,
+            union_by_name = true,
+            hive_partitioning = false                     -- year= dirs sit next to flat files; ts already has the year
         )
         """
         
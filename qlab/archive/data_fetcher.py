@@ -5,16 +5,25 @@ ETF/Stock Data Fetcher - Incremental Updater with Duplicate Removal & Stable Fil
 Purpose:
     Fetches OHLCV bars from Yahoo Finance using yfinance.
     - Incremental: only fetches/appends new data since last saved date
-    - Stable filenames: one Parquet file per ticker + interval
-    - Removes exact duplicates and resolves timestamp conflicts (keeps highest volume)
+    - Stable paths: one Parquet dataset per ticker + interval, hive-partitioned by year
+    - Append-only writes: each update adds a new fragment, history is never re-read
+    - Fragments never overlap: only unique bars after the stored last timestamp are appended
+      (highest volume wins within a batch), so plain readers see one row per timestamp
+    - compact() folds the fragments into one file per year (and dedups legacy data)
     - Smart 1m handling: auto-uses period="7d" when no period/start is appropriate
     - Weekly fetch caching to reduce redundant API calls
-    - Rate limiting (2 calls/sec)
-    - Continuity warnings for obvious gaps in daily/weekly data
+    - get_many(): one yf.download() per batch of tickers, split per ticker afterwards
+    - Rate limiting (2 calls/sec, one module-level token bucket)
+    - One keep-alive HTTP/2 curl_cffi session reused for every download
+    - Not for concurrent use: yf.download() keeps per-call results in module globals,
+      so call get()/get_many() from one thread (get_many() already batches the requests)
+    - Continuity warnings for obvious gaps in daily/weekly data (on compaction)
 
 Dependencies:
     - yfinance
+    - curl_cffi
     - pandas
+    - pyarrow
     - ratelimit
     - pathlib
 
@@ -25,12 +34,55 @@ Last modified: January 2026
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import json
+import shutil
+import time
 from datetime import datetime
 from pathlib import Path
 from abc import ABC, abstractmethod
+from curl_cffi import requests as curl_requests
+from curl_cffi.const import CurlHttpVersion
 from ratelimit import limits, sleep_and_retry
 
 
+# Each ticker is stored as a directory <TICKER>.parquet/year=YYYY/part-*.parquet
+YEAR_PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16())]), flavor="hive")
+ROW_GROUP_ROWS = 131_072
+# Stored as float32 (Yahoo prices carry ≤4 decimals). 'Adj Close' deliberately stays
+# float64 — add it here only if adjustment-factor precision stops mattering.
+FLOAT32_COLUMNS = ["Open", "High", "Low", "Close"]
+# Largest normal spacing between consecutive bars (long weekends / holiday weeks); more = a gap
+MAX_BAR_SPACING = {"1d": np.timedelta64(5, "D"), "1wk": np.timedelta64(14, "D")}
+# OHLCV compresses far better with zstd than snappy; statistics enable reader pushdown
+PARQUET_WRITE_OPTIONS = dict(
+    compression="zstd",
+    compression_level=3,
+    use_dictionary=True,
+    data_page_size=1 << 20,
+    write_statistics=True,
+)
+
+
+def downcast_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """OHLC → float32, Volume → int64 (only when it has no missing values)."""
+    casts = {c: np.float32 for c in FLOAT32_COLUMNS if c in df.columns}
+    if "Volume" in df.columns and not df["Volume"].isna().any():
+        casts["Volume"] = np.int64
+    return df.astype(casts)
+
+
+@sleep_and_retry
+@limits(calls=2, period=1)
+def rate_limited_download(**kwargs) -> pd.DataFrame:
+    """yf.download() behind one module-level token bucket (shared by every DataFetcher)."""
+    return yf.download(**kwargs)
+
+
 class DataSource(ABC):
     @abstractmethod
     def get(self, ticker, start, period, interval, use_earliest_if_unavailable=False):
@@ -40,15 +92,18 @@ class DataSource(ABC):
 class YahooFinanceSource(DataSource):
     INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m"}
 
-    @sleep_and_retry
-    @limits(calls=2, period=1)
+    def __init__(self):
+        # Reused across calls: one TLS handshake, HTTP/2 streams, gzip bodies
+        self.session = curl_requests.Session(impersonate="chrome", http_version=CurlHttpVersion.V2_0)
+
     def get(self, ticker, start, period, interval, use_earliest_if_unavailable=False):
         try:
             kwargs = {
                 "tickers": ticker,
                 "interval": interval,
                 "progress": False,
-                "auto_adjust": False
+                "auto_adjust": False,
+                "session": self.session,
             }
 
             if period:
@@ -56,11 +111,11 @@ class YahooFinanceSource(DataSource):
             else:
                 kwargs["start"] = start
 
-            data = yf.download(**kwargs)
+            data = rate_limited_download(**kwargs)
 
             if data.empty and use_earliest_if_unavailable:
                 print(f"Falling back to period='max' for {ticker} ({interval})")
-                data = yf.download(period="max", **kwargs)
+                data = rate_limited_download(period="max", **kwargs)
 
             if data.empty:
                 print(f"No data returned for {ticker} ({interval})")
@@ -78,6 +133,43 @@ class YahooFinanceSource(DataSource):
             print(f"Yahoo failed for {ticker} ({interval}): {e}")
             return None
 
+    def get_many(self, tickers, start, period, interval) -> dict:
+        """One download for several tickers → {ticker: DataFrame} (tickers without data are left out)."""
+        kwargs = {
+            "tickers": " ".join(tickers),
+            "interval": interval,
+            "group_by": "ticker",
+            "threads": False,
+            "progress": False,
+            "auto_adjust": False,
+            "session": self.session,
+        }
+        if period:
+            kwargs["period"] = period
+        else:
+            kwargs["start"] = start
+
+        try:
+            data = rate_limited_download(**kwargs)
+        except Exception as e:
+            print(f"Yahoo failed for {len(tickers)} tickers ({interval}): {e}")
+            return {}
+
+        if data.empty:
+            print(f"No data returned for {len(tickers)} tickers ({interval})")
+            return {}
+
+        out = {}
+        available = set(data.columns.get_level_values(0)) if isinstance(data.columns, pd.MultiIndex) else set()
+        for ticker in tickers:
+            if ticker not in available:
+                continue
+            df = data[ticker].dropna(how="all")
+            if not df.empty:
+                out[ticker] = df
+        print(f"{len(out)}/{len(tickers)} tickers ({interval}) → {len(data)} timestamps")
+        return out
+
 
 class DataFetcher:
     def __init__(self, save_dir: str = "./data/yfinance"):
@@ -86,6 +178,7 @@ class DataFetcher:
         self.last_fetch_week = None
         self.save_root = Path(save_dir)
         self.save_root.mkdir(parents=True, exist_ok=True)
+        self._dirs: dict = {}                   # created sub-folders (no mkdir syscall per ticker)
 
     def _get_current_week(self):
         return datetime.now().isocalendar()[:2]
@@ -111,31 +204,12 @@ class DataFetcher:
 
         # ── Incremental logic ───────────────────────────────────────────────
         effective_start = start
-        existing_last_date = None
-        path = self._get_file_path(ticker, interval)
+        existing_last_date, existing_rows = self._existing_meta(ticker, interval) if save else (None, 0)
+        if existing_last_date is not None:
+            effective_start = (existing_last_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            print(f"Existing ends {existing_last_date.date()} → fetching from {effective_start}")
 
-        if save and path.exists():
-            try:
-                old_df = pd.read_parquet(path)
-                if not old_df.empty:
-                    existing_last_date = old_df.index.max()
-                    next_day = (existing_last_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
-                    effective_start = next_day
-                    print(f"Existing ends {existing_last_date.date()} → fetching from {next_day}")
-            except Exception as e:
-                print(f"Could not read {path}: {e} → doing full fetch")
-
-        # Smart period for intraday
-        period_for_fetch = period
-        if period is None and interval in self.source.INTRADAY_INTERVALS:
-            if interval == "1m":
-                period_for_fetch = "7d"
-                effective_start = None
-                print("1m → using period='7d' (Yahoo safe limit)")
-            elif effective_start and (datetime.now() - pd.to_datetime(effective_start)).days > 60:
-                period_for_fetch = "60d"
-                effective_start = None
-                print(f"Intraday → using period='60d' for older requested start")
+        effective_start, period_for_fetch = self._fetch_window(effective_start, period, interval)
 
         data = self.source.get(
             ticker, effective_start, period_for_fetch, interval, use_earliest_if_unavailable
@@ -149,62 +223,252 @@ class DataFetcher:
         self.last_fetch_week = self._get_current_week()
 
         if save:
-            self._append_and_save(ticker, data, interval, existing_last_date)
+            # Intraday windows (period="7d"/"60d") ignore the incremental start → drop bars already stored
+            new_rows = data if existing_last_date is None else data[data.index > existing_last_date]
+            if new_rows.empty:
+                print(f"No new bars to store for {ticker} ({interval})")
+            else:
+                self._append_and_save(ticker, new_rows, interval, existing_last_date, existing_rows)
 
         return data
 
-    def _get_file_path(self, ticker: str, interval: str) -> Path:
-        interval_clean = interval.replace(" ", "").lower()
-        folder = self.save_root / interval_clean
-        folder.mkdir(parents=True, exist_ok=True)
-        return folder / f"{ticker.upper()}.parquet"
-
-    def _append_and_save(self, ticker: str, new_df: pd.DataFrame, interval: str, existing_last_date=None):
+    def get_many(self, tickers: list[str], start='2000-01-01', period=None, interval="1wk",
+                 batch_size=50, save=True) -> dict:
+        """
+        Fetch many tickers with one request per batch_size tickers → {ticker: DataFrame}.
+        A batch starts at its earliest incremental start; bars a ticker already has are dropped before saving.
+        """
+        results = {}
+        for i in range(0, len(tickers), batch_size):
+            batch = tickers[i:i + batch_size]
+            metas = {t: self._existing_meta(t, interval) if save else (None, 0) for t in batch}
+
+            effective_start = start
+            if all(last is not None for last, _ in metas.values()):
+                effective_start = (min(last for last, _ in metas.values()) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            effective_start, period_for_fetch = self._fetch_window(effective_start, period, interval)
+
+            print(f"Fetching {interval} data: {len(batch)} tickers ({batch[0]} … {batch[-1]})")
+            fetched = self.source.get_many(batch, effective_start, period_for_fetch, interval)
+
+            for ticker, data in fetched.items():
+                existing_last_date, existing_rows = metas[ticker]
+                self.cache[f"{ticker}_{interval}_{period or start}"] = data
+                self.last_fetch_week = self._get_current_week()
+                results[ticker] = data
+
+                if save:
+                    new_rows = data if existing_last_date is None else data[data.index > existing_last_date]
+                    if new_rows.empty:
+                        print(f"No new data for {ticker} ({interval})")
+                        continue
+                    self._append_and_save(ticker, new_rows, interval, existing_last_date, existing_rows)
+
+            missing = [t for t in batch if t not in fetched]
+            if missing:
+                print(f"No data for {len(missing)} tickers ({interval}): {', '.join(missing[:10])}")
+        return results
+
+    def _existing_meta(self, ticker: str, interval: str):
+        """(last_ts, rows) stored for ticker/interval, or (None, 0) (no data / unreadable)."""
         path = self._get_file_path(ticker, interval)
+        if not path.exists():
+            return None, 0
+        try:
+            return self._read_meta(path)
+        except Exception as e:
+            print(f"Could not read {path}: {e} → doing full fetch")
+            return None, 0
 
-        old_df = pd.DataFrame()
-        if path.exists():
-            try:
-                old_df = pd.read_parquet(path)
-                print(f"Loaded existing: {len(old_df)} rows (last: {old_df.index.max().date() if not old_df.empty else 'empty'})")
-            except Exception as e:
-                print(f"Failed to read {path}: {e} → treating as new")
-
-        if old_df.empty:
-            print(f"Creating new file: {path}")
-            new_df.sort_index().to_parquet(path, index=True)
-            print(f"Saved {len(new_df)} rows")
-            return
-
-        print(f"Appending {len(new_df)} rows")
-
-        combined = pd.concat([old_df, new_df]).sort_index()
+    def _fetch_window(self, effective_start, period, interval):
+        """Smart period for intraday → (start, period) actually sent to Yahoo."""
+        if period is None and interval in self.source.INTRADAY_INTERVALS:
+            if interval == "1m":
+                print("1m → using period='7d' (Yahoo safe limit)")
+                return None, "7d"
+            if effective_start and (datetime.now() - pd.to_datetime(effective_start)).days > 60:
+                print(f"Intraday → using period='60d' for older requested start")
+                return None, "60d"
+        return effective_start, period
+
+    def _interval_dir(self, interval: str) -> Path:
+        """save_root/<interval>, created on first use only (no mkdir syscall per ticker)."""
+        folder = self._dirs.get(interval)
+        if folder is None:
+            folder = self.save_root / interval.replace(" ", "").lower()
+            folder.mkdir(parents=True, exist_ok=True)
+            self._dirs[interval] = folder
+        return folder
 
-        before = len(combined)
-        combined = combined.drop_duplicates(keep='last')
-        exact_dupes = before - len(combined)
+    def _get_file_path(self, ticker: str, interval: str) -> Path:
+        return self._interval_dir(interval) / f"{ticker.upper()}.parquet"
 
-        if combined.index.duplicated().any():
-            print(f"Resolving timestamp conflicts ({ticker}) → keeping highest volume")
-            combined = combined.loc[combined.groupby(combined.index)['Volume'].idxmax()]
+    def _read_meta(self, path: Path):
+        """
+        (last_ts, rows) for a stored ticker without reading its data.
+        Uses the .meta.json sidecar; falls back to parquet footer statistics.
+        """
+        try:
+            meta = json.loads(path.with_suffix(".meta.json").read_bytes())
+            return pd.Timestamp(meta["last_ts"]), meta["rows"]
+        except (OSError, KeyError, ValueError):
+            pass
+
+        last_ts, rows = None, 0
+        for frag in ds.dataset(path, format="parquet", partitioning=YEAR_PARTITIONING).get_fragments():
+            md = frag.metadata
+            rows += md.num_rows
+            index_cols = frag.physical_schema.pandas_metadata.get("index_columns", [])
+            if not index_cols or not isinstance(index_cols[0], str):
+                continue
+            col = md.schema.names.index(index_cols[0])
+            for i in range(md.num_row_groups):
+                stats = md.row_group(i).column(col).statistics
+                if stats is not None and stats.has_min_max:
+                    ts = pd.Timestamp(stats.max)
+                    last_ts = ts if last_ts is None or ts > last_ts else last_ts
+        return last_ts, rows
+
+    def _write_meta(self, path: Path, last_ts, rows: int):
+        path.with_suffix(".meta.json").write_text(
+            json.dumps({"last_ts": pd.Timestamp(last_ts).isoformat(), "rows": int(rows)})
+        )
 
-        after = len(combined)
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        """Convert to Arrow with the frame's own dtypes (int64 Volume stays int64)."""
+        df = downcast_ohlcv(df).rename_axis("ts")   # named column → filterable by readers
+        return pa.Table.from_pandas(df, preserve_index=True)
+
+    def _write_fragment(self, path: Path, table: pa.Table):
+        """Stream a table to one parquet file in row-group sized batches (tmp file + rename)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")   # dot-prefix → ignored by dataset readers
+        with pq.ParquetWriter(tmp_path, schema=table.schema, **PARQUET_WRITE_OPTIONS) as writer:
+            for batch in table.to_batches(max_chunksize=ROW_GROUP_ROWS):
+                writer.write_batch(batch)
+        tmp_path.replace(path)
+
+    def _append_and_save(self, ticker: str, new_df: pd.DataFrame, interval: str,
+                         existing_last_date=None, existing_rows=None):
+        """
+        Append bars after the stored last timestamp as a fresh fragment per year, without reading
+        existing history. Duplicates within new_df keep the highest-volume row, as in compact().
+        Pass the caller's (existing_last_date, existing_rows) to skip re-reading the metadata.
+        """
+        path = self._get_file_path(ticker, interval)
 
-        if exact_dupes > 0:
-            print(f"Removed {exact_dupes} exact duplicates")
-        if after < before - exact_dupes:
-            print(f"Resolved {before - exact_dupes - after} timestamp conflicts")
+        if path.is_file():
+            # Old single-file layout → convert once, then append as usual
+            print(f"Migrating {path.name} to partitioned dataset")
+            self.compact(ticker, interval)
+            existing_rows = None   # compact() rewrote the row count
+
+        if not path.exists():
+            print(f"Creating new dataset: {path}")
+            old_last_ts, old_rows = None, 0
+        elif existing_rows is None:
+            old_last_ts, old_rows = self._read_meta(path)
+        else:
+            old_last_ts, old_rows = existing_last_date, existing_rows
+
+        # Only bars after the stored ones → the sidecar row count stays equal to the stored rows
+        if old_last_ts is not None:
+            new_df = new_df[new_df.index > old_last_ts]
+            if new_df.empty:
+                print(f"No new bars to store for {ticker} ({interval})")
+                return
+
+        if new_df.index.has_duplicates:
+            # Same rule as _dedup(): highest Volume first, earliest row on ties
+            new_df = new_df.sort_values("Volume", ascending=False, kind="stable", na_position="last")
+            new_df = new_df[~new_df.index.duplicated(keep="first")]
+        new_df = new_df.sort_index()
+        part_name = f"part-{time.time_ns()}.parquet"
+        for year, year_df in new_df.groupby(new_df.index.year):
+            self._write_fragment(path / f"year={year}" / part_name, self._to_table(year_df))
+
+        self._write_meta(path, new_df.index.max(), old_rows + len(new_df))
+
+        print(f"Appended {len(new_df)} rows → {path}")
+
+    def _dedup(self, ticker: str, table: pa.Table) -> pa.Table:
+        """Keep one row per timestamp: the highest-volume one (covers exact duplicates too)."""
+        # One sort by (ts, -Volume) → first row of each timestamp is the keeper
+        order = pc.sort_indices(table, sort_keys=[("ts", "ascending"), ("Volume", "descending")])
+        table = table.take(order)
+        if table.num_rows < 2:
+            return table
+
+        ts = table.column("ts").to_numpy()
+        keep = np.empty(len(ts), dtype=bool)
+        keep[0] = True
+        np.not_equal(ts[1:], ts[:-1], out=keep[1:])
+        if keep.all():
+            return table
+
+        before = table.num_rows
+        table = table.filter(pa.array(keep))
+        print(f"Removed {before - table.num_rows} duplicate/conflicting rows ({ticker}) → kept highest volume")
+        return table
+
+    def compact(self, ticker: str, interval: str = "1wk"):
+        """
+        Dedup every year partition once and rewrite it as a single fragment.
+        Stays in Arrow end to end; only one year is held in memory at a time.
+        """
+        path = self._get_file_path(ticker, interval)
+        if not path.exists():
+            print(f"Nothing to compact: {path}")
+            return
 
-        # Gap warning
-        if interval in ["1d", "1wk"] and len(combined) > 20:
-            span_days = (combined.index.max() - combined.index.min()).days
-            rough_expected = span_days / (7 if interval == "1wk" else 1) * 0.7
-            if len(combined) < rough_expected * 0.6:
-                print(f"Warning: possible gaps in {ticker} ({interval}) "
-                      f"({len(combined)} bars over ~{span_days} days)")
+        try:
+            if path.is_dir():
+                dataset = ds.dataset(path, format="parquet", partitioning=YEAR_PARTITIONING)
+                years = sorted(int(p.name.split("=", 1)[1]) for p in path.glob("year=*"))
+                parts = ((y, dataset.to_table(filter=ds.field("year") == y).drop_columns(["year"]))
+                         for y in years)
+            else:
+                # Legacy single file → one pandas pass to normalize (ts column, float32/int64)
+                legacy = pq.read_table(path).to_pandas()
+                parts = ((y, self._to_table(df)) for y, df in legacy.groupby(legacy.index.year))
+        except Exception as e:
+            print(f"Failed to read {path}: {e}")
+            return
 
-        combined.to_parquet(path, index=True)
-        print(f"Updated: {path} ({len(combined)} rows total)")
+        # Write next to the old data, then swap in
+        tmp_path = path.with_name(path.name + ".tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+
+        max_spacing = MAX_BAR_SPACING.get(interval)
+        total, last, gaps, prev_ts = 0, None, 0, None
+        for year, table in parts:
+            table = self._dedup(ticker, table)
+            if table.num_rows == 0:
+                continue
+            self._write_fragment(tmp_path / f"year={year}" / "part-0.parquet", table)
+            total += table.num_rows
+
+            ts = table.column("ts").to_numpy()
+            if max_spacing is not None:
+                # Continuity: one vectorized diff per year, plus the step from the previous year
+                gaps += int((np.diff(ts) > max_spacing).sum())
+                if prev_ts is not None and ts[0] - prev_ts > max_spacing:
+                    gaps += 1
+            prev_ts = ts[-1]
+            last = pd.Timestamp(table.column("ts")[-1].as_py())
+
+        if gaps:
+            print(f"Warning: {gaps} gaps > {max_spacing.astype(int)} days in {ticker} ({interval})")
+
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+        if tmp_path.exists():
+            tmp_path.rename(path)
+            self._write_meta(path, last, total)
+        print(f"Compacted: {path} ({total} rows total)")
 
 
 # ────────────────────────────────────────────────
@@ -231,4 +495,10 @@ if __name__ == "__main__":
     print("\nWeekly VTI from 2010 onwards")
     df_weekly = fetcher.get("VTI", start="2010-01-01", interval="1wk", save=True)
     if df_weekly is not None:
-        print(df_weekly.tail(4))
\ No newline at end of file
+        print(df_weekly.tail(4))
+
+    # Example 4: Several tickers in one request (split + saved per ticker)
+    print("\nDaily bars for a small ETF basket")
+    basket = fetcher.get_many(["SPY", "QQQ", "VTI", "BND"], interval="1d", save=True)
+    for t, df in basket.items():
+        print(t, len(df), "rows")
\ No newline at end of file
@@ -1,30 +1,46 @@
 # standardize_parquets.py
+# One-time migration: timestamp index named "ts" (tz-aware) so readers can filter on it in Arrow.
 from pathlib import Path
 import pandas as pd
 
 folder = Path("data/yfinance/1m")
-for f in folder.glob("*.parquet"):
-    try:
-        df = pd.read_parquet(f)
-        
-        # Force datetime index named "Datetime"
-        if not isinstance(df.index, pd.DatetimeIndex):
-            # guess which column is time
-            time_cols = [c for c in df.columns if "time" in c.lower() or "date" in c.lower()]
-            if time_cols:
-                df = df.set_index(time_cols[0])
-            else:
-                print(f"Skipping {f.name} - no obvious datetime column")
-                continue
-        
-        df.index.name = "Datetime"
-        df = df.sort_index()
-        
-        # Optional: drop any unnamed index columns
-        if "__index_level_0__" in df.columns:
-            df = df.drop(columns="__index_level_0__")
-            
-        df.to_parquet(f, index=True)
-        print(f"Fixed: {f.name}")
-    except Exception as e:
-        print(f"Error on {f.name}: {e}")
\ No newline at end of file
+EXCHANGE_TZ = "America/New_York"   # naive intraday bars were saved with ignore_tz=True (exchange wall time)
+
+
+def main():
+    for f in folder.glob("*.parquet"):
+        if f.is_dir():
+            print(f"Skipping {f.name} - dataset directory (rewrite with DataFetcher.compact)")
+            continue
+        try:
+            df = pd.read_parquet(f)
+
+            # Force datetime index named "ts"
+            if not isinstance(df.index, pd.DatetimeIndex):
+                # guess which column is time
+                time_cols = [c for c in df.columns if "time" in c.lower() or "date" in c.lower() or c == "ts"]
+                if time_cols:
+                    df = df.set_index(time_cols[0])
+                else:
+                    print(f"Skipping {f.name} - no obvious datetime column")
+                    continue
+
+            df.index = pd.to_datetime(df.index)
+            if df.index.tz is None:
+                df.index = df.index.tz_localize(EXCHANGE_TZ)
+
+            df.index.name = "ts"
+            df = df.sort_index()
+
+            # Optional: drop any unnamed index columns
+            if "__index_level_0__" in df.columns:
+                df = df.drop(columns="__index_level_0__")
+
+            df.to_parquet(f, index=True)
+            print(f"Fixed: {f.name}")
+        except Exception as e:
+            print(f"Error on {f.name}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,14 @@ Unified Yahoo Finance fetcher – prices + fundamentals (balance sheet & income
 
 Production-oriented features:
 - Incremental updates with deduplication and conflict resolution
-- Bulk multi-ticker downloads for speed
-- Zstandard-compressed Parquet storage
+- Concurrent per-ticker chart downloads (aiohttp) with bulk yf.download fallback
+- One keep-alive HTTP/2 curl_cffi session shared by every yfinance call
+- Zstandard-compressed Parquet storage, append-only: prices/{interval}/TICKER.parquet/part-*.parquet
+  (only bars after the stored last timestamp are appended; compact() folds the fragments into one file)
 - Separate folders: prices/{interval} and fundamentals/{kind}
 - Configurable skip logic based on file age
-- Polite rate limiting + randomized delays
+- Shared token-bucket rate limiting of yfinance calls (threads proceed in parallel up to the rate)
+- On-disk TTL cache of downloads (cache.FileCache) → re-runs skip Yahoo within the TTL
 - Basic data quality logging (gaps, negatives, short history)
 
 Goal: Fast, reliable ingestion layer for alpha research & backtesting pipelines.
@@ -22,28 +25,106 @@ Usage examples:
 
 from __future__ import annotations
 
+import asyncio
+import aiohttp
 import yfinance as yf
+from curl_cffi import requests as curl_requests
+from curl_cffi.const import CurlHttpVersion
+import numpy as np
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from aiolimiter import AsyncLimiter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
-from ratelimit import limits, sleep_and_retry
 from tqdm.auto import tqdm
 import time
-import random
+import shutil
+import threading
 import warnings
 from typing import Dict
 
+from cache import FileCache
+
 warnings.filterwarnings("ignore", category=FutureWarning)  # suppress yfinance noise
 
 class FetchConfig:
     """Central configuration – easy to tune or override."""
     SAVE_ROOT: str = "market_data/yfinance"
     COMPRESSION: str = "zstd"
+    COMPRESSION_LEVEL: int = 1           # ~level 3 size, ~3x faster writes
     SKIP_PRICES_DAYS: int = 3
     SKIP_FUNDAMENTALS_DAYS: int = 45
     BATCH_SUB_SIZE: int = 80
-    POLIT_DELAY_BASE: float = 1.8
-    POLIT_DELAY_JITTER: float = 2.2
+    ASYNC_CONNECTIONS: int = 16          # open sockets to Yahoo
+    ASYNC_IN_FLIGHT: int = 8             # outstanding chart requests
+    ASYNC_RATE_PER_SEC: int = 20         # request starts per second
+    SYNC_RATE_PER_SEC: float = 2         # yfinance calls per second, shared by all threads
+    SYNC_BURST: int = 2                  # calls allowed back-to-back after an idle spell
+    SAVE_WORKERS: int = 8                # concurrent per-ticker parquet writes
+    CACHE_DIR: str = ".cache/yfinance"   # downloaded frames, reused across runs
+    CACHE_TTL_DAYS: float = 1
+    # Rows per parquet row group: one 1m session, about a year of daily/weekly bars
+    ROW_GROUP_ROWS = {"1m": 390, "1d": 252, "1wk": 52}
+    DEFAULT_ROW_GROUP_ROWS: int = 131_072
+
+
+# Stored as float32 / int64 (Yahoo prices carry ≤4 decimals); 'Adj Close' stays float64 as in data_fetcher
+FLOAT32_COLUMNS = ["Open", "High", "Low", "Close"]
+
+
+def downcast_prices(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    OHLC → float32, Volume → int64 (only when it has no missing values).
+    Works on plain OHLCV columns and on the group_by='ticker' MultiIndex layout.
+    """
+    fields = df.columns.get_level_values(-1)
+    casts = {c: "float32" for c, f in zip(df.columns, fields) if f in FLOAT32_COLUMNS}
+    casts.update({c: "int64" for c, f in zip(df.columns, fields) if f == "Volume" and not df[c].isna().any()})
+    return df.astype(casts)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket. acquire() reserves a slot and sleeps outside the lock,
+    so waiting threads queue up at `rate` per second instead of serializing on it.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+YAHOO_LIMITER = RateLimiter(FetchConfig.SYNC_RATE_PER_SEC, burst=FetchConfig.SYNC_BURST)
+
+LOCAL_FS = fs.LocalFileSystem()
+
+PRICE_CACHE = FileCache(FetchConfig.CACHE_DIR, ttl=timedelta(days=FetchConfig.CACHE_TTL_DAYS))
+
+
+def _price_cache_key(self, tickers, start=None, period=None, interval="1d", *args, **kwargs) -> str:
+    tickers = [tickers] if isinstance(tickers, str) else tickers
+    return f"{','.join(t.strip().upper() for t in tickers)}|{interval}|{start}|{period}"
+
+
+def _price_cache_namespace(self, tickers, *args, **kwargs) -> str:
+    return tickers.strip().upper() if isinstance(tickers, str) else "_bulk"
 
 
 class YahooFinanceSource:
@@ -51,8 +132,11 @@ class YahooFinanceSource:
 
     INTRADAY_INTERVALS = {"1m", "2m", "3m", "5m", "15m", "30m", "60m", "90m", "1h"}
 
-    @sleep_and_retry
-    @limits(calls=2, period=1)
+    def __init__(self):
+        # Reused across calls/threads: one TLS handshake, HTTP/2 streams, gzip bodies
+        self.session = curl_requests.Session(impersonate="chrome", http_version=CurlHttpVersion.V2_0)
+
+    @PRICE_CACHE.memoize(key=_price_cache_key, namespace=_price_cache_namespace)   # hits skip the limiter
     def get_prices(
             self,
             tickers: Union[str, list[str]],
@@ -87,6 +171,7 @@ class YahooFinanceSource:
                 "threads": True if len(tickers) > 1 else False,
                 "timeout": 25,
                 "group_by": "ticker",           # ← KEY: ticker as top level
+                "session": self.session,
                 # "multi_level_index": True,    # usually default now; can toggle if needed
             }
 
@@ -98,6 +183,7 @@ class YahooFinanceSource:
                 kwargs["period"] = "max"
 
             try:
+                YAHOO_LIMITER.acquire()
                 data = yf.download(**kwargs)
 
                 if data is None or data.empty:
@@ -116,7 +202,7 @@ class YahooFinanceSource:
                     if first_ticker in data.columns.levels[1]:
                         data = data.xs(first_ticker, level=1, axis=1)  # rare now
 
-                return data
+                return downcast_prices(data)
 
             except Exception as e:
                 print(f"Bulk price fetch failed ({tickers_str[:60]}...): {e}")
@@ -130,6 +216,7 @@ class YahooFinanceSource:
 
                 for ticker in tickers:
                     try:
+                        YAHOO_LIMITER.acquire()
                         single = yf.download(
                             ticker,
                             period=period,
@@ -138,10 +225,10 @@ class YahooFinanceSource:
                             progress=False,
                             auto_adjust=False,
                             timeout=15,
+                            session=self.session,
                         )
                         if not single.empty and len(single) >= min_rows_expected:
                             results[ticker] = single
-                        time.sleep(0.7 + random.uniform(0, 1.2))  # polite jitter
                     except Exception as ex:
                         print(f"    Single fetch failed {ticker}: {ex}")
 
@@ -154,28 +241,140 @@ class YahooFinanceSource:
                     axis=1
                 ).swaplevel(axis=1).sort_index(axis=1)  # ticker first
 
-                return combined if not combined.empty else None
+                return downcast_prices(combined) if not combined.empty else None
+
+    # Statement kind → yf.Ticker property; each property access is its own HTTP request
+    FUNDAMENTAL_ATTRS = {
+        "balance_sheet": "balance_sheet",
+        "quarterly_balance_sheet": "quarterly_balance_sheet",
+        "income_statement": "financials",
+        "quarterly_income_statement": "quarterly_financials",
+    }
 
-    def get_fundamentals(self, ticker: str) -> Dict[str, pd.DataFrame]:
+    def get_fundamentals(self, ticker: str, kinds: list[str] | None = None) -> Dict[str, pd.DataFrame]:
+        """Requested statements (default: all four), one YAHOO_LIMITER token per request."""
         try:
-            t = yf.Ticker(ticker)
-            return {
-                "balance_sheet": t.balance_sheet,
-                "quarterly_balance_sheet": t.quarterly_balance_sheet,
-                "income_statement": t.financials,
-                "quarterly_income_statement": t.quarterly_financials,
-            }
+            t = yf.Ticker(ticker, session=self.session)
+            data = {}
+            for kind in kinds or self.FUNDAMENTAL_ATTRS:
+                YAHOO_LIMITER.acquire()
+                data[kind] = getattr(t, self.FUNDAMENTAL_ATTRS[kind])
+            return data
         except Exception as e:
             print(f"Fundamentals fetch failed for {ticker}: {e}")
             return {}
 
 
+class AsyncYahooFinanceSource:
+    """
+    Concurrent price downloads from Yahoo's v8 chart endpoint (one request per ticker).
+    Keeps several requests outstanding, so a batch costs ~max(latency) instead of sum(latency).
+    """
+
+    CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    }
+    COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+    EARLIEST_PERIOD1 = -2208988800       # 1900-01-01 UTC → covers pre-1970 listings
+
+    def __init__(self, cfg: FetchConfig | None = None):
+        self.cfg = cfg or FetchConfig()
+
+    def get_prices(
+        self,
+        tickers: list[str],
+        start: str | None = None,
+        period: str | None = None,
+        interval: str = "1d",
+        min_rows_expected: int = 10,
+    ) -> Dict[str, pd.DataFrame]:
+        """Blocking entry point → {ticker: OHLCV frame}. Failed or too-short tickers are left out."""
+        keys = {t: f"chart|{t}|{interval}|{start}|{period}" for t in tickers}
+        results = {t: df for t in tickers if (df := PRICE_CACHE.get(t, keys[t])) is not None}
+        missing = [t for t in tickers if t not in results]
+        if missing:
+            fetched = asyncio.run(self.gather_all(missing, start, period, interval, min_rows_expected))
+            for t, df in fetched.items():
+                PRICE_CACHE.set(t, keys[t], df)
+            results.update(fetched)
+        return results
+
+    async def gather_all(self, tickers, start, period, interval, min_rows_expected=10) -> Dict[str, pd.DataFrame]:
+        params = {"interval": interval, "includeAdjustedClose": "true"}
+        if period:
+            params["range"] = period
+        else:
+            # Explicit window even for full history: range=max lets Yahoo hand back coarser bars
+            # than `interval` on long histories (yfinance sends period1=1900-01-01 for "max" too)
+            params["period1"] = str(int(pd.Timestamp(start).timestamp()) if start else self.EARLIEST_PERIOD1)
+            params["period2"] = str(int(time.time()))
+
+        # Created inside the running loop (asyncio.run makes a fresh one per call)
+        semaphore = asyncio.Semaphore(self.cfg.ASYNC_IN_FLIGHT)
+        limiter = AsyncLimiter(self.cfg.ASYNC_RATE_PER_SEC, 1)
+        connector = aiohttp.TCPConnector(limit=self.cfg.ASYNC_CONNECTIONS)
+        timeout = aiohttp.ClientTimeout(total=25)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.HEADERS) as session:
+            frames = await asyncio.gather(
+                *[self.fetch_one(session, semaphore, limiter, t, params) for t in tickers]
+            )
+
+        return {
+            t: df for t, df in zip(tickers, frames)
+            if df is not None and len(df) >= min_rows_expected
+        }
+
+    async def fetch_one(self, session, semaphore, limiter, ticker: str, params: dict) -> pd.DataFrame | None:
+        async with semaphore, limiter:
+            try:
+                async with session.get(self.CHART_URL.format(ticker=ticker), params=params) as resp:
+                    if resp.status != 200:
+                        print(f"Chart fetch failed {ticker}: HTTP {resp.status}")
+                        return None
+                    payload = await resp.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Chart fetch failed {ticker}: {e!r}")
+                return None
+
+        try:
+            return self._chart_to_frame(payload["chart"]["result"][0], params["interval"])
+        except (KeyError, IndexError, TypeError) as e:
+            print(f"Chart parse failed {ticker}: {e!r}")
+            return None
+
+    def _chart_to_frame(self, result: dict, interval: str) -> pd.DataFrame | None:
+        """chart.result[0] → OHLCV frame shaped like yf.download(auto_adjust=False)."""
+        timestamps = result.get("timestamp")
+        if not timestamps:
+            return None
+
+        quote = result["indicators"]["quote"][0]
+        columns = {name: quote[key] for key, name in self.COLUMNS.items() if key in quote}
+        adjclose = result["indicators"].get("adjclose")
+        if adjclose:
+            columns["Adj Close"] = adjclose[0]["adjclose"]
+        df = pd.DataFrame.from_dict(columns)
+
+        tz = result.get("meta", {}).get("exchangeTimezoneName", "America/New_York")
+        index = pd.to_datetime(timestamps, unit="s", utc=True).as_unit("ns").tz_convert(tz)
+        if interval in YahooFinanceSource.INTRADAY_INTERVALS:
+            df.index = index.rename("Datetime")
+        else:
+            df.index = index.tz_localize(None).normalize().rename("Date")   # daily+: naive dates
+        return downcast_prices(df.dropna(how="all"))
+
+
 class DataFetcher:
     def __init__(self, save_dir: str = FetchConfig.SAVE_ROOT):
         self.source = YahooFinanceSource()
         self.cfg = FetchConfig()
+        self.async_source = AsyncYahooFinanceSource(self.cfg)
         self.save_root = Path(save_dir).resolve()
         self.save_root.mkdir(parents=True, exist_ok=True)
+        self._dirs: dict = {}                   # created sub-folders (no mkdir syscall per ticker)
         self.last_fetch_week = None
 
     def _get_current_week(self) -> tuple[int, int]:
@@ -190,15 +389,20 @@ class DataFetcher:
 
     # ── File paths ───────────────────────────────────────────────────────────────
 
+    def _data_dir(self, *parts: str) -> Path:
+        """save_root/<parts…>, created on first use only (no mkdir syscall per ticker)."""
+        folder = self._dirs.get(parts)
+        if folder is None:
+            folder = self.save_root.joinpath(*parts)
+            folder.mkdir(parents=True, exist_ok=True)
+            self._dirs[parts] = folder
+        return folder
+
     def _get_price_path(self, ticker: str, interval: str) -> Path:
-        folder = self.save_root / "prices" / interval.lower().replace(" ", "")
-        folder.mkdir(parents=True, exist_ok=True)
-        return folder / f"{ticker.upper()}.parquet"
+        return self._data_dir("prices", interval.lower().replace(" ", "")) / f"{ticker.upper()}.parquet"
 
     def _get_fundamentals_path(self, ticker: str, kind: str) -> Path:
-        folder = self.save_root / "fundamentals" / kind
-        folder.mkdir(parents=True, exist_ok=True)
-        return folder / f"{ticker.upper()}.parquet"
+        return self._data_dir("fundamentals", kind) / f"{ticker.upper()}.parquet"
 
     # ── Core single-ticker fetch ───────────────────────────────────────────────
 
@@ -223,7 +427,7 @@ class DataFetcher:
             age_days = (time.time() - path.stat().st_mtime) / 86400
             if age_days < skip_days:
                 try:
-                    df = pd.read_parquet(path)
+                    df = self._read_prices(path)
                     if fetch_fundamentals:
                         self.get_fundamentals(ticker, save=save, force=force_full)
                     return df
@@ -237,40 +441,47 @@ class DataFetcher:
         old_df = pd.DataFrame()
         if path.exists() and not force_full:
             try:
-                old_df = pd.read_parquet(path)
+                old_df = self._read_prices(path)
             except Exception as e:
                 print(f"Read error {path}: {e}")
 
         last_date = old_df.index.max() if not old_df.empty else None
 
         if last_date and not self._should_fetch_this_week() and not force_full:
-            if (datetime.now() - last_date).days < 5:
+            if (pd.Timestamp.now(tz=last_date.tz) - last_date).days < 5:
                 if fetch_fundamentals:
                     self.get_fundamentals(ticker, save=save)
                 return old_df
 
         new_df = self.source.get_prices(ticker, start=start, period=period, interval=interval)
 
+        # get_prices() returns the group_by='ticker' layout → plain OHLCV columns
+        if new_df is not None and isinstance(new_df.columns, pd.MultiIndex) and ticker in new_df.columns.levels[0]:
+            new_df = new_df[ticker].dropna(how="all")
+
+        # Nothing fetched, or the ticker's slice of the batch was all NaN → keep what is stored
         if new_df is None or new_df.empty:
             if fetch_fundamentals:
                 self.get_fundamentals(ticker, save=save)
             return old_df if not old_df.empty else None
 
-        # Merge + clean
-        if not old_df.empty:
-            combined = pd.concat([old_df, new_df]).sort_index()
+        # Merge + clean (returned frame only — storage just gets the new rows)
+        if not old_df.empty and self._strictly_after(old_df, new_df):
+            # Typical incremental update: sorted, unique, all after history → plain append
+            combined = pd.concat([old_df, new_df])
+        elif not old_df.empty:
+            combined = pd.concat([old_df, new_df])
             before = len(combined)
-            combined = combined[~combined.index.duplicated(keep="last")]
-            if combined.index.duplicated().any():
-                combined = combined.loc[combined.groupby(combined.index)["Volume"].idxmax()]
+            combined = self._dedup_prices(combined)
             if len(combined) < before:
                 print(f"{ticker} prices: cleaned {before - len(combined)} rows")
         else:
             combined = new_df
 
         if save:
-            combined.to_parquet(path, compression=self.cfg.COMPRESSION)
-            print(f"Saved/updated prices: {path} ({len(combined)} rows)")
+            written = self._save_incremental_price(path, new_df, interval, replace=force_full,
+                                                   last_ts=None if old_df.empty else old_df.index[-1])
+            print(f"Saved/updated prices: {path} (+{written} rows, {len(combined)} total)")
 
         if fetch_fundamentals:
             self.get_fundamentals(ticker, save=save, force=force_full)
@@ -289,12 +500,8 @@ class DataFetcher:
         results = {}
         skip_days = skip_existing_days if skip_existing_days is not None else self.cfg.SKIP_FUNDAMENTALS_DAYS
 
-        for kind in [
-            "balance_sheet",
-            "quarterly_balance_sheet",
-            "income_statement",
-            "quarterly_income_statement",
-        ]:
+        stale = []
+        for kind in self.source.FUNDAMENTAL_ATTRS:
             path = self._get_fundamentals_path(ticker, kind)
 
             if path.exists() and not force:
@@ -306,8 +513,15 @@ class DataFetcher:
                         continue
                     except Exception:
                         pass
+            stale.append(kind)
+
+        if not stale:
+            return results
 
-            data = self.source.get_fundamentals(ticker)
+        # One Ticker for all stale statements → one request (and one limiter token) each
+        data = self.source.get_fundamentals(ticker, stale)
+        for kind in stale:
+            path = self._get_fundamentals_path(ticker, kind)
             if kind not in data or data[kind].empty:
                 continue
 
@@ -350,6 +564,11 @@ class DataFetcher:
         skip_p = skip_existing_days_prices or self.cfg.SKIP_PRICES_DAYS
         skip_f = skip_existing_days_fund or self.cfg.SKIP_FUNDAMENTALS_DAYS
 
+        # Same intraday lookback as get() (Yahoo rejects full-history windows below 1d)
+        period = None
+        if interval in self.source.INTRADAY_INTERVALS:
+            period = "7d" if interval == "1m" else "60d"
+
         total_prices = total_fund = total_skipped = total_failed = 0
 
         for batch_num in range(start_batch, end_batch + 1):
@@ -395,34 +614,37 @@ class DataFetcher:
 
             print(f"→ Prices to fetch: {len(to_fetch_prices)} | Fundamentals: {len(to_fetch_fund)}")
 
-            # ── Price batch fetch ───────────────────────────────────────
+            # ── Price fetch: all tickers in flight at once (async chart API) ──
             success_p = failed_p = 0
-            for i in tqdm(range(0, len(to_fetch_prices), self.cfg.BATCH_SUB_SIZE), desc="Prices"):
-                sub = to_fetch_prices[i : i + self.cfg.BATCH_SUB_SIZE]
+            fetched = self.async_source.get_prices(to_fetch_prices, period=period, interval=interval) if to_fetch_prices else {}
+            saved, failed = self._save_many_prices(fetched, interval, desc="Prices")
+            success_p += saved
+            failed_p += failed
+
+            # Whatever the chart API couldn't serve → bulk yf.download (rate-limited by get_prices)
+            retry = [t for t in to_fetch_prices if t not in fetched]
+            if retry:
+                print(f"  → {len(retry)} tickers via yf.download fallback")
+            for i in range(0, len(retry), self.cfg.BATCH_SUB_SIZE):
+                sub = retry[i : i + self.cfg.BATCH_SUB_SIZE]
                 try:
-                    data = self.source.get_prices(sub, interval=interval)
+                    data = self.source.get_prices(sub, period=period, interval=interval)
                     if data is None or data.empty:
                         failed_p += len(sub)
                         continue
 
-                    for ticker in sub:
-                        if ticker not in data.columns.levels[0]:
-                            failed_p += 1
-                            continue
-                        df = data[ticker].dropna(how="all")
-                        if df.empty:
-                            failed_p += 1
-                            continue
-                        path = self._get_price_path(ticker, interval)
-                        self._save_incremental_price(path, df)
-                        success_p += 1
+                    split = self._split_by_ticker(data)
+                    frames = {t: split[t] for t in sub if t in split and not split[t].empty}
+                    failed_p += len(sub) - len(frames)
+
+                    saved, failed = self._save_many_prices(frames, interval, desc="Prices (fallback)")
+                    success_p += saved
+                    failed_p += failed
 
                 except Exception as e:
                     print(f"Price sub-batch failed ({len(sub)} tickers): {e}")
                     failed_p += len(sub)
 
-                time.sleep(self.cfg.POLIT_DELAY_BASE + random.uniform(0, self.cfg.POLIT_DELAY_JITTER))
-
             total_prices += success_p
             total_failed += failed_p
 
@@ -445,7 +667,6 @@ class DataFetcher:
                 except Exception as e:
                     print(f"  Fundamentals failed for {ticker}: {e}")
                     failed_f += 1
-                time.sleep(1.2 + random.uniform(0, 1.8))
 
             total_fund += success_f
             total_failed += failed_f
@@ -456,24 +677,160 @@ class DataFetcher:
 
         print(f"\nOverall: Prices {total_prices} | Fundamentals {total_fund} | Skipped {total_skipped} | Failed {total_failed}")
 
-    def _save_incremental_price(self, path: Path, new_df: pd.DataFrame):
-        """Shared incremental save logic for prices."""
-        if path.exists():
+    @staticmethod
+    def _split_by_ticker(data: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """group_by='ticker' wide frame → {ticker: OHLCV frame without all-NaN rows}, in one pass."""
+        if data.shape[1] == 0:
+            return {}
+        codes, tickers = pd.factorize(data.columns.get_level_values(0))
+        if (np.diff(codes) < 0).any():                    # yfinance already groups columns by ticker
+            order = np.argsort(codes, kind="stable")
+            data, codes = data.iloc[:, order], codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        stops = np.r_[starts[1:], len(codes)]
+
+        # One notna pass for every ticker (instead of a dropna per slice); column slices keep dtypes
+        has_data = np.logical_or.reduceat(data.notna().to_numpy(), starts, axis=1)
+        fields = data.columns.get_level_values(-1)
+        return {
+            tickers[k]: data.iloc[has_data[:, k], s:e].set_axis(fields[s:e], axis=1)
+            for k, (s, e) in enumerate(zip(starts, stops))
+        }
+
+    def _save_many_prices(self, frames: Dict[str, pd.DataFrame], interval: str, desc: str = "Saving") -> tuple[int, int]:
+        """Save {ticker: downloaded frame} (only bars after the stored ones) on a thread pool (Arrow IO + compression release the GIL) → (saved, failed)."""
+        def save(item) -> bool:
+            ticker, df = item
             try:
-                old_df = pd.read_parquet(path)
-                combined = pd.concat([old_df, new_df]).sort_index()
-                before = len(combined)
-                combined = combined[~combined.index.duplicated(keep="last")]
-                if combined.index.duplicated().any():
-                    combined = combined.loc[combined.groupby(combined.index)["Volume"].idxmax()]
-                if len(combined) < before:
-                    print(f"  Cleaned {before - len(combined)} rows in {path.name}")
-            except Exception:
-                combined = new_df
-        else:
-            combined = new_df
-
-        combined.to_parquet(path, compression=self.cfg.COMPRESSION)
+                self._save_incremental_price(self._get_price_path(ticker, interval), df, interval)
+                return True
+            except Exception as e:
+                print(f"  Save failed {ticker}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.cfg.SAVE_WORKERS) as pool:
+            saved = sum(tqdm(pool.map(save, frames.items()), total=len(frames), desc=desc))
+        return saved, len(frames) - saved
+
+    def _save_incremental_price(
+        self, path: Path, new_df: pd.DataFrame, interval: str, replace: bool = False, last_ts=None,
+    ) -> int:
+        """
+        Append the bars after the stored last timestamp as one more fragment → rows written.
+        last_ts: the caller's stored maximum, if it already has it; otherwise read from footer statistics.
+        """
+        if replace and path.exists():
+            shutil.rmtree(path) if path.is_dir() else path.unlink()
+        elif path.exists():
+            if last_ts is None:
+                last_ts = self._stored_last_ts(path)
+            if last_ts is not None:
+                new_df = new_df[new_df.index > last_ts]
+            if new_df.empty:
+                return 0
+
+        if path.is_file():
+            # Legacy single file → first fragment of the directory (rename only, no rewrite)
+            legacy = path.with_name(path.name + ".legacy")
+            path.rename(legacy)
+            path.mkdir()
+            legacy.rename(path / "part-0.parquet")
+
+        ds.write_dataset(
+            pa.Table.from_pandas(downcast_prices(new_df), preserve_index=True),
+            base_dir=path,
+            format="parquet",
+            basename_template=f"part-{time.time_ns()}-{{i}}.parquet",   # sorts in write order
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(**self._price_write_options()),
+            max_rows_per_group=self._row_group_rows(interval),
+        )
+        return len(new_df)
+
+    @staticmethod
+    def _stored_last_ts(path: Path) -> pd.Timestamp | None:
+        """Latest stored timestamp from the parquet footers (row-group statistics) – no data pages read."""
+        last_ts = None
+        for frag in ds.dataset(path, format="parquet", filesystem=LOCAL_FS).get_fragments():
+            md = frag.metadata
+            index_cols = (frag.physical_schema.pandas_metadata or {}).get("index_columns", [])
+            if not index_cols or not isinstance(index_cols[0], str):
+                continue
+            col = md.schema.names.index(index_cols[0])
+            for i in range(md.num_row_groups):
+                stats = md.row_group(i).column(col).statistics
+                if stats is not None and stats.has_min_max:
+                    ts = pd.Timestamp(stats.max)
+                    last_ts = ts if last_ts is None or ts > last_ts else last_ts
+        return last_ts
+
+    def _row_group_rows(self, interval: str) -> int:
+        """Small groups per interval → statistics pushdown can skip to the recent bars."""
+        return self.cfg.ROW_GROUP_ROWS.get(interval, self.cfg.DEFAULT_ROW_GROUP_ROWS)
+
+    def _price_write_options(self) -> dict:
+        """Parquet writer settings shared by fragment appends and compact()."""
+        return dict(
+            compression=self.cfg.COMPRESSION,
+            compression_level=self.cfg.COMPRESSION_LEVEL,
+            use_dictionary=True,
+            data_page_size=1 << 20,
+            write_statistics=True,
+        )
+
+    @staticmethod
+    def _strictly_after(old_df: pd.DataFrame, new_df: pd.DataFrame) -> bool:
+        """True if new_df is sorted, duplicate-free and starts after old_df (sorted) ends."""
+        new_idx = new_df.index
+        return (
+            len(new_idx) > 0
+            and new_idx.is_monotonic_increasing
+            and not new_idx.has_duplicates
+            and new_idx[0] > old_df.index[-1]
+        )
+
+    @staticmethod
+    def _dedup_prices(df: pd.DataFrame) -> pd.DataFrame:
+        """Sorted, one row per timestamp: highest Volume wins, ties go to the later row."""
+        if not df.index.has_duplicates:          # cached on the index – no bool array built
+            return df if df.index.is_monotonic_increasing else df.sort_index()
+        name = df.index.name
+        # One stable (timestamp, Volume) sort → the keeper is the last row of each timestamp
+        return (
+            df.rename_axis("__idx").reset_index()
+            .sort_values(["__idx", "Volume"], kind="stable", na_position="first")
+            .drop_duplicates(subset="__idx", keep="last")
+            .set_index("__idx")
+            .rename_axis(name)
+        )
+
+    def _read_prices(self, path: Path) -> pd.DataFrame:
+        """All fragments (or a legacy single file) → one sorted, deduplicated frame."""
+        # pre_buffer coalesces each row group's column chunks into one read; fragments decode on threads
+        df = pq.read_table(str(path), use_threads=True, pre_buffer=True, filesystem=LOCAL_FS).to_pandas()
+        before = len(df)
+        df = self._dedup_prices(df)
+        if len(df) < before:
+            print(f"  Cleaned {before - len(df)} rows in {path.name}")
+        return df
+
+    def compact(self, ticker: str, interval: str = "1d"):
+        """Fold a ticker's fragments into a single deduplicated file (e.g. monthly)."""
+        path = self._get_price_path(ticker, interval)
+        if not path.is_dir():
+            return
+        df = self._read_prices(path)
+
+        tmp = path.with_name(path.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir()
+        pq.write_table(pa.Table.from_pandas(downcast_prices(df), preserve_index=True),
+                       tmp / "part-0.parquet", row_group_size=self._row_group_rows(interval),
+                       **self._price_write_options())
+        shutil.rmtree(path)
+        tmp.rename(path)
+        print(f"Compacted {path} ({len(df)} rows)")
 
 
 # ── CLI for batch runs ────────────────────────────────────────────────────────
@@ -7,18 +7,27 @@ Shows % of up bars (Close > Open) across intraday timeframes for a specified or
 Shows only top 15 stocks per "best timeframe" group + separate heatmaps per group.
 Filters out low-volume tickers (<5M shares daily) for scalping suitability.
 Saves heatmaps: group ones in day subfolder, overall one directly in HEATMAP_OUTPUT_DIR.
+Per-ticker results are streamed to HEATMAP_OUTPUT_DIR/results_<date>.arrow, then filtered lazily with polars.
 
 Last modified: January 2026
 """
 
 import pandas as pd
 import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs as pafs
 import matplotlib.pyplot as plt
 import seaborn as sns
-from datetime import datetime, timedelta
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from pandas_market_calendars import get_calendar
 from tqdm import tqdm
+from numba import njit, prange, set_num_threads
 
 # ── Configuration ───────────────────────────────────────────────────────────
 DATA_DIR             = Path("data/yfinance/1m")
@@ -42,8 +51,23 @@ HEATMAP_SAVE_MODE    = "overall_only"                    # "all", "overall_only"
 
 HEATMAP_OUTPUT_DIR   = Path("heatmaps")
 
+MAX_WORKERS          = os.cpu_count()                    # analysis processes
+TICKERS_PER_TASK     = 32                                # tickers per worker task (one Arrow scan each)
+
 INTERVALS = ['1min', '2min', '3min', '5min', '7min', '15min', '30min', '60min', '120min', '240min']
 INTERVAL_LABELS = ['1min', '2min', '3min', '5min', '7min', '15min', '30min', '1h', '2h', '4h']
+INTERVAL_MINUTES = np.array([pd.Timedelta(i) // pd.Timedelta(minutes=1) for i in INTERVALS], dtype=np.int64)
+
+LOCAL_FS = pafs.LocalFileSystem(use_mmap=True)           # mmap: pages come straight from the OS cache
+# Common read schema: Arrow casts each file (float64 legacy, other tz/unit) on the fly
+SCAN_SCHEMA = pa.schema([
+    ("ts", pa.timestamp("us", tz="UTC")),
+    ("Open", pa.float32()),
+    ("Close", pa.float32()),
+    ("Volume", pa.int64()),
+])
+# One row per analyzed ticker, streamed to HEATMAP_OUTPUT_DIR/results_<date>.arrow
+RESULTS_SCHEMA = pa.schema([("Ticker", pa.string())] + [(label, pa.float64()) for label in INTERVAL_LABELS])
 
 MARKET_OPEN  = '09:30:00'
 MARKET_CLOSE = '16:00:00'
@@ -51,73 +75,187 @@ MARKET_CLOSE = '16:00:00'
 plt.rcParams['figure.max_open_warning'] = 0
 
 
+# ── Kernels ─────────────────────────────────────────────────────────────────
+@njit(cache=True, parallel=True)
+def up_bar_counts(opens, closes, mins, ks):
+    """
+    For each k in ks, bucket sorted 1-min bars by mins // k and count buckets whose
+    last close > first open (NaN prices skipped, like resample's first/last).
+    Totals cover every bucket from the first bar's to the last bar's, empty ones included
+    (they are non-up) — the same denominator as resample().agg(..., Volume='sum').dropna(how='all').
+    Returns (up_counts, totals), one entry per k.
+    """
+    n = opens.shape[0]
+    ups = np.zeros(ks.shape[0], dtype=np.int64)
+    totals = np.zeros(ks.shape[0], dtype=np.int64)
+    if n == 0:
+        return ups, totals
+    for j in prange(ks.shape[0]):
+        k = ks[j]
+        totals[j] = mins[n - 1] // k - mins[0] // k + 1
+        prev = mins[0] // k
+        first = np.nan
+        last = np.nan
+        for i in range(n):
+            b = mins[i] // k
+            if b != prev:
+                if last > first:
+                    ups[j] += 1
+                first = np.nan
+                last = np.nan
+                prev = b
+            if first != first:
+                first = opens[i]
+            if closes[i] == closes[i]:
+                last = closes[i]
+        if last > first:
+            ups[j] += 1
+    return ups, totals
+
+
+# Compile once at import (float32 = on-disk price dtype) so the ticker loop only pays for parquet loads
+up_bar_counts(np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.int64), INTERVAL_MINUTES)
+
+
 # ── Helpers ─────────────────────────────────────────────────────────────────
+# Full-day NYSE closures (early closes are still sessions). Fallback when
+# pandas_market_calendars is missing — covers 2023–2027 only, extend each December
+NYSE_HOLIDAYS_FALLBACK = np.array([
+    '2023-01-02', '2023-01-16', '2023-02-20', '2023-04-07', '2023-05-29',
+    '2023-06-19', '2023-07-04', '2023-09-04', '2023-11-23', '2023-12-25',
+    '2024-01-01', '2024-01-15', '2024-02-19', '2024-03-29', '2024-05-27',
+    '2024-06-19', '2024-07-04', '2024-09-02', '2024-11-28', '2024-12-25',
+    '2025-01-01', '2025-01-09', '2025-01-20', '2025-02-17', '2025-04-18', '2025-05-26',
+    '2025-06-19', '2025-07-04', '2025-09-01', '2025-11-27', '2025-12-25',
+    '2026-01-01', '2026-01-19', '2026-02-16', '2026-04-03', '2026-05-25',
+    '2026-06-19', '2026-07-03', '2026-09-07', '2026-11-26', '2026-12-25',
+    '2027-01-01', '2027-01-18', '2027-02-15', '2027-03-26', '2027-05-31',
+    '2027-06-18', '2027-07-05', '2027-09-06', '2027-11-25', '2027-12-24',
+], dtype='datetime64[D]')
+
+try:
+    from pandas_market_calendars import get_calendar
+    # Regular + ad-hoc closures, built once at import (the calendar spans 1885–2200)
+    NYSE_HOLIDAYS = np.array(get_calendar('NYSE').holidays().holidays, dtype='datetime64[D]')
+except ImportError:
+    NYSE_HOLIDAYS = NYSE_HOLIDAYS_FALLBACK
+NYSE_CAL = np.busdaycalendar(weekmask='1111100', holidays=NYSE_HOLIDAYS)
+# Whole years the holiday list covers → days outside would silently count holidays as sessions
+NYSE_CAL_YEARS = (NYSE_HOLIDAYS.min().astype(object).year, NYSE_HOLIDAYS.max().astype(object).year)
+
+
+def _check_calendar_covers(day: np.datetime64):
+    year = day.astype(object).year
+    if not NYSE_CAL_YEARS[0] <= year <= NYSE_CAL_YEARS[1]:
+        print(f"Warning: {day} is outside the NYSE holiday list ({NYSE_CAL_YEARS[0]}–{NYSE_CAL_YEARS[1]}); "
+              f"holidays will be treated as trading days. Install pandas_market_calendars or extend "
+              f"NYSE_HOLIDAYS_FALLBACK.")
+
+
 def get_trading_day(target_date_str: str | None = None):
-    nyse = get_calendar('NYSE')
-    today = pd.Timestamp.now(tz='America/New_York').normalize()
+    today = np.datetime64(pd.Timestamp.now(tz='America/New_York').date(), 'D')
 
     if target_date_str:
         try:
-            target = pd.Timestamp(target_date_str, tz='America/New_York').normalize()
-            schedule = nyse.schedule(start_date=target - timedelta(days=10), end_date=target + timedelta(days=1))
-            if target.date() in schedule.index.date:
-                print(f"Using specified trading day: {target.date()}")
-                return target.date()
+            target = np.datetime64(pd.Timestamp(target_date_str).date(), 'D')
+            _check_calendar_covers(target)
+            if np.is_busday(target, busdaycal=NYSE_CAL):
+                print(f"Using specified trading day: {target}")
+                return target.astype(object)
             else:
                 print(f"Warning: {target_date_str} is not a trading day. Falling back...")
         except Exception as e:
             print(f"Invalid date '{target_date_str}': {e}. Falling back...")
 
-    schedule = nyse.schedule(start_date=today - timedelta(days=40), end_date=today)
-    if len(schedule) < 2:
-        return None
-    return schedule.index[-2].date()
-
-
-def load_ticker_1min(ticker: str) -> pd.DataFrame | None:
-    path = DATA_DIR / f"{ticker.upper()}.parquet"
-    if not path.exists():
-        if DEBUG_BARS:
-            print(f"{ticker}: no parquet file at {path}")
-        return None
-    try:
-        df = pd.read_parquet(path)
-        if not isinstance(df.index, pd.DatetimeIndex):
-            if 'index' in df.columns:
-                df = df.set_index('index')
-            df.index = pd.to_datetime(df.index)
-        if df.index.tz is None:
-            df.index = df.index.tz_localize('UTC')
-        else:
-            df.index = df.index.tz_convert('UTC')
-        df = df.sort_index()
-        if DEBUG_BARS:
-            print(f"{ticker}: loaded {len(df)} total rows | date range {df.index.min().date()} → {df.index.max().date()}")
-        return df
-    except Exception as e:
-        print(f"{ticker}: load error {e}")
-        return None
+    # Session before the latest one on or before today (same as schedule.index[-2])
+    _check_calendar_covers(today)
+    return np.busday_offset(today, -1, roll='backward', busdaycal=NYSE_CAL).astype(object)
+
+
+def _table_to_bars(table: pa.Table) -> pd.DataFrame:
+    """Arrow table → ts-indexed, sorted, de-duplicated bar frame."""
+    df = table.to_pandas(self_destruct=True, split_blocks=True)
+    if 'ts' in df.columns:
+        df = df.set_index('ts')
+    df = df.sort_index()
+    if df.index.has_duplicates:
+        # Uncompacted fragments can overlap → keep highest volume per bar
+        df = df.sort_values('Volume', kind='stable')
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+def collect_ticker_files(tickers: list[str], year: int) -> dict[str, str]:
+    """Map every parquet file holding `year` for the given tickers → ticker."""
+    files = {}
+    for ticker in tickers:
+        path = DATA_DIR / f"{ticker.upper()}.parquet"
+        if path.is_dir():
+            for f in sorted(path.glob(f"year={year}/*.parquet")):
+                files[str(f)] = ticker
+        elif path.is_file():
+            files[str(path)] = ticker
+    return files
+
+
+def iter_day_1min(files: dict[str, str], target_date: datetime.date):
+    """
+    One threaded Arrow scan over all files for the target New York day.
+    Yields (ticker, bars) as each ticker's fragments finish; files of a ticker are adjacent,
+    so only one ticker is held in memory at a time.
+    """
+    day_start = pd.Timestamp(target_date, tz='America/New_York')
+    day_end = day_start + pd.Timedelta(days=1)
+
+    dataset = ds.dataset(list(files), schema=SCAN_SCHEMA, format="parquet", filesystem=LOCAL_FS)
+    scanner = dataset.scanner(
+        columns=SCAN_SCHEMA.names,
+        filter=(ds.field('ts') >= day_start) & (ds.field('ts') < day_end),
+        batch_size=1 << 20,
+        use_threads=True,
+    )
+
+    current, batches = None, []
+    for tagged in scanner.scan_batches():
+        ticker = files[tagged.fragment.path]
+        if ticker != current:
+            if current is not None:
+                yield current, _table_to_bars(pa.Table.from_batches(batches, schema=SCAN_SCHEMA))
+            current, batches = ticker, []
+        batches.append(tagged.record_batch)
+    if current is not None:
+        yield current, _table_to_bars(pa.Table.from_batches(batches, schema=SCAN_SCHEMA))
+
+
+def analyze_tickers(tickers: list[str], target_date: datetime.date) -> tuple[int, dict]:
+    """Worker task: scan + analyze one chunk of tickers → (tickers with files, {ticker: result})."""
+    files = collect_ticker_files(tickers, target_date.year)
+    results = {}
+    for ticker, df in iter_day_1min(files, target_date):
+        result = analyze_day(ticker, df, target_date)
+        if result:
+            results[ticker] = result
+    return len(set(files.values())), results
 
 
 def analyze_day(ticker: str, df_1min: pd.DataFrame, target_date: datetime.date) -> dict | None:
-    """Filter to ALL bars on the target date (full day, including extended hours), resample, compute % up bars."""
+    """Filter to ALL bars on the target date (full day, including extended hours), bucket, compute % up bars."""
     if df_1min is None or df_1min.empty:
         if DEBUG_BARS:
             print(f"{ticker}: skipped - no data loaded or empty")
         return None
 
-    # Convert to New York time for consistent date slicing
-    df_et = df_1min.tz_convert('America/New_York')
-
-    # Slice ALL bars on the target date (no time-of-day filter)
-    target_date_str = target_date.strftime('%Y-%m-%d')
-    df_day = df_et[df_et.index.date == target_date]
+    # Slice ALL bars on the target New York date (no time-of-day filter). The index is
+    # sorted, so binary-search the day boundaries in the stored tz instead of converting it.
+    day_start = pd.Timestamp(target_date, tz='America/New_York').tz_convert(df_1min.index.tz)
+    lo, hi = df_1min.index.searchsorted([day_start, day_start + pd.Timedelta(days=1)])
+    df_day = df_1min.iloc[lo:hi]
 
     if DEBUG_BARS:
         print(f"{ticker} - total rows on {target_date}: {len(df_day)}")
         if not df_day.empty:
-            print(f"  First bar: {df_day.index.min()}")
-            print(f"  Last bar:  {df_day.index.max()}")
+            print(f"  First bar: {df_day.index[0].tz_convert('America/New_York')}")
+            print(f"  Last bar:  {df_day.index[-1].tz_convert('America/New_York')}")
 
     if df_day.empty:
         if DEBUG_BARS:
@@ -136,25 +274,17 @@ def analyze_day(ticker: str, df_1min: pd.DataFrame, target_date: datetime.date)
             print(f"{ticker}: skipped - volume {daily_volume:,.0f} < {MIN_DAILY_VOLUME:,}")
         return None
 
-    # Resample and compute % up bars (now using full-day bars)
+    # % up bars per timeframe without resampling: every interval is a whole number
+    # of minutes, so a bar's bucket is (minutes since NY midnight) // k — same bins as
+    # resample() in New York time. Empty buckets between bars still count as (non-up) bars.
+    opens  = df_day['Open'].to_numpy()       # float32 on disk → no upcast copy
+    closes = df_day['Close'].to_numpy()
+    mins   = ((df_day.index - day_start) // pd.Timedelta(minutes=1)).to_numpy(dtype=np.int64)
+
+    ups, totals = up_bar_counts(opens, closes, mins, INTERVAL_MINUTES)
+
     results = {}
-    for intv, label in zip(INTERVALS, INTERVAL_LABELS):
-        resampled = df_day.resample(intv).agg({
-            'Open':   'first',
-            'High':   'max',
-            'Low':    'min',
-            'Close':  'last',
-            'Volume': 'sum'
-        }).dropna(how='all')
-
-        if resampled.empty:
-            results[label] = 0.0
-            if DEBUG_BARS:
-                print(f"{ticker} {label}: 0 bars (empty resample)")
-            continue
-
-        up_count = (resampled['Close'] > resampled['Open']).sum()
-        total = len(resampled)
+    for up_count, total, label in zip(ups, totals, INTERVAL_LABELS):
         pct_up = (up_count / total) * 100 if total > 0 else 0.0
         results[label] = round(pct_up, 1)
 
@@ -180,37 +310,54 @@ def main():
             all_tickers.extend([t.strip().upper() for t in f if t.strip() and not t.startswith('#')])
     all_tickers = sorted(set(all_tickers))[:MAX_SYMBOLS]
     print(f"Loaded {len(all_tickers):,} tickers from {len(ticker_files)} batches")
-    results = {}
-    with tqdm(total=len(all_tickers), desc="Analyzing tickers") as pbar:
-        for ticker in all_tickers:
-            df = load_ticker_1min(ticker)
-            if df is None:
-                pbar.update()
-                continue
-            result = analyze_day(ticker, df, target_date)
-            if result:
-                results[ticker] = result
-            pbar.update()
-    if not results:
+    chunks = [all_tickers[i:i + TICKERS_PER_TASK] for i in range(0, len(all_tickers), TICKERS_PER_TASK)]
+    HEATMAP_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    results_path = HEATMAP_OUTPUT_DIR / f"results_{date_str}.arrow"
+    n_results = 0
+    n_with_data = 0
+    # Chunks are independent → one process per core; Arrow IO still threads inside each worker.
+    # spawn, not fork: forking after the numba thread pool started hangs on pool shutdown.
+    # One numba thread per worker — the processes already cover every core.
+    # Each finished chunk is appended to an Arrow IPC file → no all-ticker dict/DataFrame in memory
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=mp.get_context("spawn"),
+                             initializer=set_num_threads, initargs=(1,)) as ex, \
+            pa.ipc.new_file(str(results_path), RESULTS_SCHEMA) as writer, \
+            tqdm(total=len(all_tickers), desc="Analyzing tickers") as pbar:
+        worker = partial(analyze_tickers, target_date=target_date)
+        for chunk, (n_files, chunk_results) in zip(chunks, ex.map(worker, chunks)):
+            n_with_data += n_files
+            if chunk_results:
+                rows = [{"Ticker": ticker, **result} for ticker, result in chunk_results.items()]
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=RESULTS_SCHEMA))
+                n_results += len(rows)
+            pbar.update(len(chunk))
+    print(f"{n_with_data:,} tickers had 1m parquet data")
+    if not n_results:
         print("No usable data found.")
         print("Check:")
         print("  • Are parquets in data/yfinance/1m/ ?")
         print("  • Do they contain data for the target date?")
         print("  • Try TARGET_DATE = None or a recent date")
         return
-    print(f"\n✓ Analyzed {len(results)} stocks with usable data\n")
-    df_results = pd.DataFrame.from_dict(results, orient='index')[INTERVAL_LABELS]
-    good_mask = df_results.max(axis=1) >= MIN_THRESHOLD
-    df_filtered = df_results[good_mask].copy()
+    print(f"\n✓ Analyzed {n_results} stocks with usable data → {results_path}\n")
+    # Filter + sort lazily; only the qualifying rows are materialized in pandas
+    max_pct = pl.max_horizontal(INTERVAL_LABELS)
+    df_filtered = (
+        pl.scan_ipc(results_path)
+        .filter(max_pct >= MIN_THRESHOLD)
+        .with_columns(max_pct.round(1).alias('Max_%'))
+        .sort('Max_%', descending=True)
+        .collect()
+        .to_pandas()
+        .set_index('Ticker')
+        .rename_axis(None)
+    )
     if df_filtered.empty:
         print(f"No stocks hit ≥{MIN_THRESHOLD}% up bars on {date_str}.")
         return
-    df_filtered['Max_%'] = df_filtered.max(axis=1).round(1)
     df_filtered['Strong_count'] = (df_filtered >= HIGH_THRESHOLD).sum(axis=1)
     df_filtered['Good_count'] = (df_filtered >= MED_THRESHOLD).sum(axis=1)
-    df_filtered = df_filtered.sort_values('Max_%', ascending=False)
     if SAVE_INTERMEDIATE_CSV:
-        HEATMAP_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
         csv_path = HEATMAP_OUTPUT_DIR / f"{CSV_OUTPUT_SUFFIX}_{date_str}.csv"
         save_df = df_filtered.copy()
         save_df.insert(0, 'Ticker', save_df.index)
@@ -64,7 +64,9 @@ def load_daily_data(ticker: str) -> pd.DataFrame | None:
     try:
         df = pd.read_parquet(path)
         if not isinstance(df.index, pd.DatetimeIndex):
-            if "Datetime" in df.columns:
+            if "ts" in df.columns:
+                df = df.set_index("ts")
+            elif "Datetime" in df.columns:
                 df = df.set_index("Datetime")
             elif "Date" in df.columns:
                 df = df.set_index("Date")
@@ -134,18 +136,16 @@ def setup_qlab_duckdb(db_path: Path = DB_PATH, read_only=False):
     con.execute("DROP VIEW IF EXISTS bars_1min;")
 
     parquet_folder = BASE_DATA_DIR / "1m"
-    if not parquet_folder.exists() or not any(parquet_folder.glob("*.parquet")):
+    # Flat <TICKER>.parquet files and DataFetcher's <TICKER>.parquet/year=YYYY/part-*.parquet datasets
+    if not parquet_folder.exists() or not any(p.is_file() for p in parquet_folder.rglob("*.parquet")):
         raise ValueError(f"No 1m files in {parquet_folder}")
 
     query = f"""
     CREATE OR REPLACE VIEW bars_1min AS
     SELECT
         '1m' AS interval,
-        regexp_replace(
-            regexp_replace(filename, '^.*[\\\\/]', ''),     -- remove path
-            '\\.parquet$', ''
-        ) AS symbol,
-        "Datetime"::TIMESTAMP AS ts,
+        regexp_extract(filename, '([^/\\\\]+)\\.parquet(?:[/\\\\]|$)', 1) AS symbol,   -- first <TICKER>.parquet path component
+        timezone('America/New_York', "ts") AS ts,      -- tz-aware on disk → exchange wall time
         "Open"::DOUBLE AS open,
         High::DOUBLE AS high,
         Low::DOUBLE AS low,
@@ -153,11 +153,12 @@ def setup_qlab_duckdb(db_path: Path = DB_PATH, read_only=False):
         Volume::BIGINT AS volume,
         filename AS source_file
     FROM read_parquet(
-        '{parquet_folder}/*.parquet',
+        '{parquet_folder}/**/*.parquet',
         filename = true,
-        union_by_name = true
+        union_by_name = true,
+        hive_partitioning = false                 -- year= dirs sit next to flat files; ts already has the year
     )
-    WHERE "Datetime" IS NOT NULL
+    WHERE "ts" IS NOT NULL
     """
 
     con.execute(query)
@@ -3,22 +3,24 @@ extract_all_tickers.py - One-time script to extract all valid tickers from both
 Creates: data/yfinance/all_tickers.txt + data/yfinance/batch_001.txt, batch_002.txt, etc.
 """
 
+import re
 import pandas as pd
 from pathlib import Path
 
 # ── Configuration ────────────────────────────────────────────────────────────
 BATCH_SIZE = 50
-BASE_DIR = Path("market_data/yfinance/batches")
+BASE_DIR = Path("data/yfinance/batches")      # read by data_batch_downloader / processing_EV
 ALL_TICKERS_FILE = BASE_DIR / "all_tickers.txt"
 # ─────────────────────────────────────────────────────────────────────────────
 
+# Any of these characters anywhere → not a plain ticker (one regex scan per symbol)
+_BAD_CHARS = re.compile("[" + re.escape(r'^~`!@#$%&*+={}[]|\:;"\'<>,.?/') + "]")
+
 def clean_ticker(t: str) -> str | None:
     t = str(t).strip().upper()
     if not (1 <= len(t) <= 10):
         return None
-    if any(c in t for c in r'^~`!@#$%&*+={}[]|\:;"\'<>,.?/'):
-        return None
-    if t.startswith(('-', '.', '$', '=', '+')):
+    if _BAD_CHARS.search(t) or t[0] == '-':   # '.', '$', '=', '+' are already bad chars
         return None
     return t
 
@@ -41,10 +43,7 @@ def extract_all_unique_tickers():
                 print(f"No symbol column in {path.name}")
                 continue
 
-            for val in df[symbol_col].dropna():
-                cleaned = clean_ticker(val)
-                if cleaned:
-                    tickers.add(cleaned)
+            tickers.update(df[symbol_col].dropna().map(clean_ticker).dropna())
 
         except Exception as e:
             print(f"Error reading {path}: {e}")
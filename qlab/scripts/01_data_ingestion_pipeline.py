@@ -38,23 +38,18 @@ if str(QLAB_DIR) not in sys.path:
 
 print(f"Added to sys.path: {QLAB_DIR.resolve()}")           # helpful for debugging
 
-# ── Safe dynamic imports ─────────────────────────────────────────────────────
-
-def safe_import(module_name: str, function_name: str = "main"):
-    """Try to import module.function or return None"""
-    try:
-        # Now we can just use the module name (no path needed)
-        module = __import__(module_name)
-        return getattr(module, function_name, None)
-    except (ImportError, AttributeError) as e:
-        print(f"  Failed to import {module_name}.{function_name}  →  {e}")
-        return None
+# ── Stage entry points (imported once, called in-process) ────────────────────
 
+from data_batch_downloader import DATA_ROOT, run_batches as download_main
+from data_standardize_parquets import main as standardize_main
 
-# Usage stays almost identical
-extract_main     = safe_import("data_extract_all_tickers", "extract_all_unique_tickers")
-download_main    = safe_import("data_batch_downloader",   "main")
-standardize_main = safe_import("data_standardize_parquets", "main")
+# 001_… isn't a valid module name → load the extractor from its file
+_spec = importlib.util.spec_from_file_location(
+    "data_extract_all_tickers", Path(__file__).with_name("001_data_extract_all_tickers.py")
+)
+_extract = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_extract)
+extract_main = _extract.extract_all_unique_tickers
 
 # ── Configuration ─────────────────────────────────────────────────────────────
 
@@ -73,20 +68,12 @@ BATCH_END   = 20                # inclusive
 # Only used when download_1min = True
 INTRADAY_INTERVAL = "1m"        # "1m", "2m", "5m", etc.
 
-BASE_DIR = Path(__file__).parent.resolve()
-BATCH_DIR = BASE_DIR / "data" / "yfinance" / "batches"
+BATCH_DIR = _extract.BASE_DIR   # where the extractor writes batch_XXX.txt (= data_batch_downloader.BASE_DIR)
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def run_step(name: str, func, *args, required: bool = True):
-    if func is None:
-        print(f"→ SKIPPED: {name}  (module/function not found)")
-        if required:
-            print("Critical step missing → stopping.")
-            sys.exit(1)
-        return
-
     print(f"\n{'═' * 80}")
     print(f" {name.upper()}")
     print(f"{'═' * 80}\n")
@@ -104,31 +91,6 @@ def run_step(name: str, func, *args, required: bool = True):
             sys.exit(1)
 
 
-def download_batches(interval: str, start_batch: int, end_batch: int):
-    """
-    Run the batch downloader for given interval and batch range.
-    Simulates CLI argument passing (most reliable for existing scripts).
-    """
-    if download_main is None:
-        raise ImportError("data_batch_downloader.main could not be imported")
-
-    old_argv = sys.argv[:]
-    try:
-        # Simulate command-line call: script.py START END
-        sys.argv = [str(Path(download_main.__code__.co_filename)), str(start_batch), str(end_batch)]
-
-        # Set interval (most batch downloaders use a global INTERVAL)
-        import data_batch_downloader
-        original_interval = getattr(data_batch_downloader, 'INTERVAL', '1d')
-        data_batch_downloader.INTERVAL = interval
-
-        download_main()
-    finally:
-        sys.argv = old_argv
-        if 'data_batch_downloader' in sys.modules:
-            data_batch_downloader.INTERVAL = original_interval
-
-
 # ── Main Pipeline ─────────────────────────────────────────────────────────────
 
 def main():
@@ -137,34 +99,34 @@ def main():
     print(f"Batch range: {BATCH_START:03d} – {BATCH_END:03d}\n")
 
     # 1. Extract tickers & create batch files (usually one-time)
-    if RUN["extract"] and extract_main is not None:
+    if RUN["extract"]:
         run_step("Extracting tickers & creating batches", extract_main)
 
     # 2. Download daily data (most common / repeated step)
     if RUN["download_daily"]:
         run_step(
             f"Downloading daily data (batches {BATCH_START:03d}–{BATCH_END:03d})",
-            download_batches,
-            "1d", BATCH_START, BATCH_END
+            download_main,
+            BATCH_START, BATCH_END, "1d", BATCH_DIR
         )
 
     # 3. Optional: recent intraday snapshot (~last 7 days)
     if RUN["download_1min"]:
         run_step(
             f"Downloading recent {INTRADAY_INTERVAL} data",
-            download_batches,
-            INTRADAY_INTERVAL, BATCH_START, BATCH_END
+            download_main,
+            BATCH_START, BATCH_END, INTRADAY_INTERVAL, BATCH_DIR
         )
 
     # 4. Optional: fix index names, timezones, columns, etc.
-    if RUN["standardize"] and standardize_main is not None:
+    if RUN["standardize"]:
         run_step("Standardizing / repairing parquet files", standardize_main)
 
     print("\n" + "═" * 80)
     print("Pipeline finished.")
-    print(f"Data should now be in: data/yfinance/1d/*.parquet   (and other intervals if enabled)")
+    print(f"Data should now be in: {DATA_ROOT / '1d'}   (and other intervals if enabled)")
     print("Next recommended steps:")
-    print("  • Inspect files:     dir data\\yfinance\\1d\\   (or ls -lh on unix)")
+    print(f"  • Inspect files:     dir {DATA_ROOT / '1d'}   (or ls -lh on unix)")
     print("  • Run quick quality check (see code below)")
     print("  • Start EV analysis: python processing_EV.py")
     print("  • Build simple momentum backtest")
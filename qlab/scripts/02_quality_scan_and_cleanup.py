@@ -4,7 +4,7 @@
 Quality Scan + Aggressive Cleanup — Any Timeframe Parquet Folder
 ───────────────────────────────────────────────────────────────
 
-1. Scans all .parquet files in data/yfinance/<interval>/
+1. Scans all .parquet files / dataset dirs in data/yfinance/<interval>/
 2. Generates fresh quality report
 3. Immediately runs aggressive cleanup using that report:
    - ≤5 rows → junk/very_short
@@ -27,8 +27,14 @@ Last modified: February 2026
 
 import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
 from tqdm.auto import tqdm
+from numba import njit, prange
 import shutil
 from datetime import datetime
 
@@ -41,6 +47,9 @@ ZERO_VOL_THRESHOLD_DAYS = 60
 ZERO_VOL_PCT_THRESHOLD  = 0.20
 ROWS_AGGRESSIVE_FILTER  = 1500
 
+LOCAL_FS = fs.LocalFileSystem(use_mmap=True)
+PARQUET  = ds.ParquetFileFormat()
+
 # ── Path / Interval helpers ──────────────────────────────────────────────────
 
 def get_interval():
@@ -90,43 +99,100 @@ def move_file(ticker: str, reason: str, data_dir: Path, junk_short, junk_bad, ju
 
 # ── Quality scan ──────────────────────────────────────────────────────────────
 
+def discover_fragments(data_dir: Path) -> dict[str, list]:
+    """
+    One recursive listing of the folder → {TICKER: [parquet fragments]}.
+    Covers plain TICKER.parquet files and TICKER.parquet/ dataset dirs; sidecars are skipped.
+    """
+    root = data_dir.resolve()
+    by_ticker = {}
+    for info in LOCAL_FS.get_file_info(fs.FileSelector(str(root), recursive=True)):
+        if not info.is_file or not info.path.endswith(".parquet"):
+            continue
+        top = Path(info.path).relative_to(root).parts[0]
+        if top.startswith((".", "_")) or not top.endswith(".parquet"):
+            continue
+        by_ticker.setdefault(Path(top).stem.upper(), []).append(PARQUET.make_fragment(info.path, LOCAL_FS))
+    return dict(sorted(by_ticker.items()))
+
+
+def read_scan_columns(fragments: list):
+    """Only the timestamp index + Close + Volume, as Arrow (each footer is parsed once)."""
+    schema = fragments[0].physical_schema
+    index_cols = (schema.pandas_metadata or {}).get("index_columns", [])
+    ts_col = index_cols[0] if index_cols and isinstance(index_cols[0], str) else None
+    wanted = [c for c in (ts_col, "Close", "Volume") if c and c in schema.names]
+    tables = [f.to_table(schema=f.physical_schema, columns=wanted) for f in fragments]
+    return pa.concat_tables(tables, promote_options="permissive"), ts_col
+
+
+@njit(cache=True, parallel=True)
+def close_volume_stats(close, volume):
+    """One fused pass per column → (nan_close, bad_close, zero_vol_days). No fastmath: it drops NaN checks."""
+    nan_close = 0
+    bad_close = 0
+    for i in prange(close.size):
+        c = close[i]
+        if c != c:
+            nan_close += 1
+        elif c <= 0:
+            bad_close += 1
+    zero_vol = 0
+    for i in prange(volume.size):
+        if volume[i] <= 0:
+            zero_vol += 1
+    return nan_close, bad_close, zero_vol
+
+
+def column_array(table, name: str) -> np.ndarray:
+    """Column as numpy (nulls → NaN); empty float array if the column is missing."""
+    if name not in table.column_names:
+        return np.empty(0)
+    return table[name].to_numpy()
+
+
 def scan_quality(data_dir: Path):
-    files = sorted(data_dir.glob("*.parquet"))
-    if not files:
+    fragments = discover_fragments(data_dir) if data_dir.is_dir() else {}
+    if not fragments:
         print(f"No .parquet files found in {data_dir}")
         return None
 
-    print(f"Scanning {len(files):,} files ...\n")
+    print(f"Scanning {len(fragments):,} tickers ...\n")
 
     results = []
 
-    for p in tqdm(files, desc="Scanning"):
-        ticker = p.stem.upper()
+    for ticker, parts in tqdm(fragments.items(), desc="Scanning"):
         try:
-            df = pd.read_parquet(p)
-            n = len(df)
+            # Arrow compute kernels over 2-3 columns – no DataFrame is built
+            table, ts_col = read_scan_columns(parts)
+            n = table.num_rows
             if n == 0:
                 results.append({"ticker": ticker, "rows": 0, "flag": "empty"})
                 continue
 
-            idx = df.index
-            start = idx.min()
-            end   = idx.max()
-            span  = (end - start).days if n > 1 else 0
-
-            closes  = df.get("Close", pd.Series(dtype=float))
-            volumes = df.get("Volume", pd.Series(dtype=float))
+            if ts_col:
+                ts = table[ts_col]
+                bounds = pc.min_max(ts)
+                start = pd.Timestamp(bounds["min"].as_py())
+                end   = pd.Timestamp(bounds["max"].as_py())
+                dup_index = n - pc.count_distinct(ts, mode="all").as_py()
+            else:
+                start = end = pd.NaT
+                dup_index = 0
+            span  = (end - start).days if n > 1 and pd.notnull(start) else 0
 
+            nan_close, bad_close, zero_vol = close_volume_stats(column_array(table, "Close"),
+                                                                column_array(table, "Volume"))
             row = {
                 "ticker": ticker,
                 "rows": n,
                 "start_date": start.date() if pd.notnull(start) else None,
                 "end_date":   end.date()   if pd.notnull(end)   else None,
                 "span_days": span,
-                "nan_close": closes.isna().sum(),
-                "bad_close": (closes <= 0).sum(),
-                "zero_vol_days": (volumes <= 0).sum(),
-                "dup_index": idx.duplicated().sum(),
+                "nan_close": nan_close,
+                "bad_close": bad_close,
+                "zero_vol_days": zero_vol,
+                "dup_index": dup_index,
             }
 
             if row["rows"] <= MIN_ROWS_FLAG_SHORT:
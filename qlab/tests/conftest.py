@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Same import root the scripts use (qlab/archive on sys.path)
+ARCHIVE_DIR = Path(__file__).resolve().parents[1] / "archive"
+if str(ARCHIVE_DIR) not in sys.path:
+    sys.path.insert(0, str(ARCHIVE_DIR))
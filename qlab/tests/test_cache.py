@@ -0,0 +1,48 @@
+import os
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+from cache import FileCache
+
+
+def test_roundtrip(tmp_path):
+    cache = FileCache(tmp_path)
+    df = pd.DataFrame({"Close": [1.0, 2.0]})
+    cache.set("AAPL", "AAPL|1d", df)
+    pd.testing.assert_frame_equal(cache.get("AAPL", "AAPL|1d"), df)
+    assert cache.get("AAPL", "AAPL|1wk") is None
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = FileCache(tmp_path, ttl=timedelta(hours=1))
+    cache.set("ns", "key", 42)
+    path = cache._path("ns", "key")
+    two_hours_ago = time.time() - 7200
+    os.utime(path, (two_hours_ago, two_hours_ago))
+    assert cache.get("ns", "key") is None
+    assert cache.get("ns", "key", ttl=timedelta(hours=3)) == 42
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = FileCache(tmp_path)
+    cache.set("ns", "key", 42)
+    cache._path("ns", "key").write_bytes(b"not zstd")
+    assert cache.get("ns", "key") is None
+
+
+def test_memoize_skips_none(tmp_path):
+    cache = FileCache(tmp_path)
+    calls = []
+
+    @cache.memoize(key=lambda t: t, namespace=lambda t: t)
+    def download(t):
+        calls.append(t)
+        return None if t == "BAD" else t.lower()
+
+    assert download("AAPL") == "aapl"
+    assert download("AAPL") == "aapl"
+    assert download("BAD") is None
+    assert download("BAD") is None
+    assert calls == ["AAPL", "BAD", "BAD"]
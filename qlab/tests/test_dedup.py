@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import data_batch_updater
+import data_fetcher
+import fetch
+
+
+def _bars(ts, volume, close=None):
+    idx = pd.DatetimeIndex(pd.to_datetime(ts), name="ts")
+    close = close if close is not None else np.arange(len(ts), dtype=float)
+    return pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": close, "Volume": volume}, index=idx)
+
+
+def test_dedup_prices_keeps_max_volume():
+    df = _bars(["2024-01-02", "2024-01-01", "2024-01-02", "2024-01-02"], [5, 1, 9, np.nan])
+    out = fetch.DataFetcher._dedup_prices(df)
+    assert list(out.index) == list(pd.to_datetime(["2024-01-01", "2024-01-02"]))
+    assert out["Volume"].tolist() == [1, 9]
+
+
+def test_dedup_prices_tie_goes_to_later_row():
+    df = _bars(["2024-01-01", "2024-01-01"], [5, 5], close=[1.0, 2.0])
+    assert fetch.DataFetcher._dedup_prices(df)["Close"].tolist() == [2.0]
+
+
+def test_max_volume_rows_first_on_ties_nan_never_wins():
+    df = _bars(["2024-01-01", "2024-01-01", "2024-01-01", "2024-01-02", "2024-01-02"],
+               [np.nan, 7, 7, np.nan, np.nan], close=[1.0, 2.0, 3.0, 4.0, 5.0])
+    out = data_batch_updater.DataFetcher._max_volume_rows(df)
+    assert out["Close"].tolist() == [2.0, 4.0]
+
+
+def test_arrow_dedup_keeps_max_volume(tmp_path):
+    fetcher = data_fetcher.DataFetcher(save_dir=tmp_path)
+    table = pa.Table.from_pandas(_bars(["2024-01-02", "2024-01-01", "2024-01-02"], [5, 1, 9]), preserve_index=True)
+    out = fetcher._dedup("X", table)
+    assert out.column("Volume").to_pylist() == [1, 9]
+
+
+def test_append_writes_unique_bars_after_last_ts(tmp_path):
+    fetcher = data_fetcher.DataFetcher(save_dir=tmp_path)
+    fetcher._append_and_save("X", _bars(["2024-12-30", "2024-12-31"], [1, 2]), "1d")
+    # Overlaps the stored last bar and repeats a new one → only the max-volume 2025-01-02 row is added
+    fetcher._append_and_save("X", _bars(["2024-12-31", "2025-01-02", "2025-01-02"], [9, 3, 8]), "1d")
+
+    path = fetcher._get_file_path("X", "1d")
+    stored = pd.read_parquet(path)
+    assert not stored.index.has_duplicates
+    assert stored["Volume"].tolist() == [1, 2, 8]
+    assert json.loads(path.with_suffix(".meta.json").read_text())["rows"] == 3
@@ -0,0 +1,40 @@
+import pytest
+
+import fetch
+from fetch import RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeps are recorded instead of taken."""
+    state = {"now": 0.0, "sleeps": []}
+    monkeypatch.setattr(fetch.time, "monotonic", lambda: state["now"])
+    monkeypatch.setattr(fetch.time, "sleep", state["sleeps"].append)
+    return state
+
+
+def test_burst_then_wait(clock):
+    limiter = RateLimiter(rate=2, burst=2)
+    limiter.acquire()
+    limiter.acquire()
+    assert clock["sleeps"] == []
+    limiter.acquire()
+    assert clock["sleeps"] == [pytest.approx(0.5)]
+
+
+def test_refill_over_time(clock):
+    limiter = RateLimiter(rate=2, burst=2)
+    for _ in range(3):
+        limiter.acquire()               # bucket now owes one token
+    clock["sleeps"].clear()
+    clock["now"] = 1.5                  # +3 tokens → back to 2
+    limiter.acquire()
+    assert clock["sleeps"] == []
+
+
+def test_refill_capped_at_burst(clock):
+    limiter = RateLimiter(rate=2, burst=2)
+    clock["now"] = 100.0
+    for _ in range(3):
+        limiter.acquire()
+    assert clock["sleeps"] == [pytest.approx(0.5)]
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from processing_EV import up_bar_counts
+
+
+def test_empty_buckets_count_as_non_up():
+    # Minutes 0,1 | (2,3 empty) | 4,5 → three 2-min buckets, only the first one is up
+    mins = np.array([0, 1, 4, 5], dtype=np.int64)
+    opens = np.array([1.0, 1.0, 3.0, 3.0], dtype=np.float32)
+    closes = np.array([1.5, 2.0, 2.0, 2.5], dtype=np.float32)
+    ups, totals = up_bar_counts(opens, closes, mins, np.array([1, 2], dtype=np.int64))
+    assert totals.tolist() == [6, 3]
+    assert ups.tolist() == [2, 1]
+
+
+def test_matches_resample_denominator():
+    rng = np.random.default_rng(0)
+    mins = np.sort(rng.choice(390, size=200, replace=False)).astype(np.int64)
+    opens = rng.uniform(10, 11, size=200).astype(np.float32)
+    closes = rng.uniform(10, 11, size=200).astype(np.float32)
+    idx = pd.Timestamp("2024-01-02 09:30") + pd.to_timedelta(mins, unit="min")
+    df = pd.DataFrame({"Open": opens, "Close": closes, "Volume": 1}, index=idx)
+
+    ks = np.array([1, 5, 30], dtype=np.int64)
+    ups, totals = up_bar_counts(opens, closes, mins, ks)
+    for j, k in enumerate(ks):
+        bars = df.resample(f"{k}min").agg({"Open": "first", "Close": "last", "Volume": "sum"}).dropna(how="all")
+        assert totals[j] == len(bars)
+        assert ups[j] == int((bars["Close"] > bars["Open"]).sum())
+
+
+def test_no_bars():
+    empty = np.zeros(0, dtype=np.float32)
+    ups, totals = up_bar_counts(empty, empty, np.zeros(0, dtype=np.int64), np.array([1, 5], dtype=np.int64))
+    assert ups.tolist() == [0, 0] and totals.tolist() == [0, 0]